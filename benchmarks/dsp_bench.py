@@ -0,0 +1,81 @@
+"""Per-frame cost of the DSP filter stage.
+
+Feeds synthetic PCM through FilteredSource for N simulated guilds, the
+way discord.py's AudioPlayer would read it (but as fast as possible), and
+reports the time per 20 ms frame against the real-time budget.
+
+    python -m benchmarks.dsp_bench --guilds 50 --seconds 30
+"""
+import argparse
+import statistics
+import time
+
+import discord
+import numpy as np
+
+from utils.dsp import FRAME_SIZE, NIGHTCORE_RATE, AudioFilters, FilteredSource
+
+FRAME_BUDGET = 0.020
+
+class NoiseSource(discord.AudioSource):
+    """Endless pink-ish noise, pre-rendered so generating it isn't measured"""
+
+    def __init__(self, seed):
+        rng = np.random.default_rng(seed)
+        samples = np.cumsum(rng.normal(0, 300, (50 * 960, 2)), axis=0)
+        samples -= samples.mean(axis=0)
+        pcm = np.clip(samples, -32768, 32767).astype(np.int16).tobytes()
+        self.frames = [pcm[i:i + FRAME_SIZE] for i in range(0, len(pcm), FRAME_SIZE)]
+        self.index = 0
+
+    def read(self):
+        frame = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        return frame
+
+PRESETS = {
+    "off": {},
+    "volume": {"volume": 0.5},
+    "normalize": {"normalize": True},
+    "bass": {"bass_db": 6},
+    "nightcore": {"rate": NIGHTCORE_RATE},
+    "all": {"volume": 0.8, "normalize": True, "bass_db": 6, "rate": NIGHTCORE_RATE},
+}
+
+def run(preset, guilds, frames):
+    sources = []
+    for seed in range(guilds):
+        filters = AudioFilters()
+        for name, value in PRESETS[preset].items():
+            setattr(filters, name, value)
+        sources.append(FilteredSource(NoiseSource(seed), filters))
+
+    timings = []
+    for _ in range(frames):
+        for source in sources:
+            start = time.perf_counter()
+            source.read()
+            timings.append(time.perf_counter() - start)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-g", "--guilds", type=int, default=20)
+    parser.add_argument("-s", "--seconds", type=float, default=10, help="audio per guild")
+    parser.add_argument("-p", "--preset", choices=PRESETS, action="append")
+    args = parser.parse_args()
+
+    frames = int(args.seconds * 50)
+    print(f"{args.guilds} guilds x {args.seconds:g}s of audio")
+    print(f"{'preset':<10} {'mean us':>9} {'p99 us':>9} {'budget':>8} {'guilds/core':>12}")
+    for preset in args.preset or PRESETS:
+        timings = run(preset, args.guilds, frames)
+        mean = statistics.fmean(timings)
+        p99 = statistics.quantiles(timings, n=100)[98]
+        print(
+            f"{preset:<10} {mean * 1e6:>9.1f} {p99 * 1e6:>9.1f} "
+            f"{mean / FRAME_BUDGET:>8.2%} {int(FRAME_BUDGET / mean):>12}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,606 @@
+"""End-to-end playback benchmark with fake Discord objects.
+
+Drives the real MusicCog and MusicPlayer through their prefix commands.
+Discord is replaced by fake guilds, contexts and voice clients (the voice
+client reads its source every 20 ms on a thread, like discord.py's
+AudioPlayer, and Opus-encodes PCM if libopus is available), YouTube by a
+stub resolver and a local HTTP server that FFmpeg streams the fixture
+files from. Needs FFmpeg; everything else is offline.
+
+Reports:
+  - time to first audio: from the play command to the first frame read,
+    for one guild at a time and for N guilds starting together
+  - CPU per guild while N guilds play (bot process plus its FFmpeg
+    children; audio node processes are not included)
+  - memory per queued track
+  - command latency while the N guilds are playing
+
+    python -m benchmarks.e2e_bench --guilds 10
+    python -m benchmarks.e2e_bench --media song.webm --json > baseline.json
+    python -m benchmarks.e2e_bench --baseline baseline.json   # exits 1 on regressions
+
+Environment settings (MIXER, AUDIO_MODE, AUDIO_NODES, ...) apply as they do
+for the bot, so configurations can be compared run against run.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import re
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+
+import discord
+from aiohttp import web
+
+from cogs.music import MusicCog
+from utils.ratelimit import TokenBucket
+from utils.resolver import Resolver
+from utils.track import Track
+
+FRAME_DELAY = 0.02
+SAMPLE_RATE = 48000
+FIXTURE_RE = re.compile(r"fx(\d+)")
+# Codec hints the stub resolver reports, like yt-dlp does; other files are probed
+CODECS = {".webm": ("opus", 48000), ".opus": ("opus", 48000), ".wav": ("pcm_s16le", 48000)}
+# Lower is better for all of them
+METRICS = [
+    "ttfa_ms_p50", "ttfa_ms_p95", "load_ttfa_ms_p50", "load_ttfa_ms_p95",
+    "cpu_percent_per_guild", "cpu_ms_per_audio_minute", "bytes_per_queued_track",
+    "command_ms_p50", "command_ms_p95", "command_ms_max", "loop_lag_ms_max",
+]
+
+# Fixture media
+
+def write_fixture(path, seconds):
+    """Stereo 48 kHz sine sweep, so FFmpeg has real samples to decode"""
+    frames = bytearray()
+    for i in range(int(seconds * SAMPLE_RATE)):
+        t = i / SAMPLE_RATE
+        value = int(8000 * math.sin(2 * math.pi * (220 + 40 * t) * t))
+        sample = value.to_bytes(2, "little", signed=True)
+        frames += sample + sample
+    with wave.open(path, "wb") as out:
+        out.setnchannels(2)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        out.writeframes(bytes(frames))
+
+async def serve(directory, port):
+    """Fixture server process: static files with Range support"""
+    app = web.Application()
+    app.router.add_static("/media", directory)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    print(f"LISTENING {runner.addresses[0][1]}", flush=True)
+    await asyncio.Event().wait()
+
+async def start_server(directory):
+    """Run the fixture server as a child process, so its CPU isn't counted as the bot's"""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "benchmarks.e2e_bench", "--serve", directory,
+        stdout=asyncio.subprocess.PIPE,
+    )
+    line = await asyncio.wait_for(process.stdout.readline(), 30)
+    if not line.startswith(b"LISTENING "):
+        process.kill()
+        raise RuntimeError("Fixture server failed to start")
+    return process, f"http://127.0.0.1:{int(line.split()[1])}"
+
+class StubResolver(Resolver):
+    """Resolver whose extraction is answered from the fixture files.
+
+    Queries look like "fixture 12"; every number is a distinct track, the
+    files are reused round robin. Caching and per-guild limits are the
+    real Resolver's.
+    """
+
+    def __init__(self, base_url, files, durations, delay=0.0):
+        super().__init__(mode="thread", workers=1)
+        self.base_url = base_url
+        self.files = files
+        self.durations = durations
+        self.delay = delay
+        self.limiter = TokenBucket(rate=1e9, burst=10**9)  # The fixtures don't need protecting
+
+    def ref(self, number):
+        video_id = f"fx{number:06d}"
+        return Track(video_id, f"Fixture {number}", f"{self.base_url}/watch?v={video_id}",
+                     duration=self.durations[number % len(self.files)])
+
+    def stub(self, func, query):
+        number = int((FIXTURE_RE.search(query) or re.search(r"(\d+)", query)).group(1))
+        ref = self.ref(number)
+        if func == "get_track_ref":
+            return ref
+        if func == "get_youtube_audio":
+            name = self.files[number % len(self.files)]
+            acodec, asr = CODECS.get(os.path.splitext(name)[1], (None, None))
+            return ref.with_stream(f"{self.base_url}/media/{name}", acodec, asr)
+        raise ValueError(f"{func} is not supported by the benchmark resolver")
+
+    async def _run(self, guild_id, generation, func, *args, client=None):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.stub(func.__name__, *args)
+
+    async def warm_up(self):
+        pass
+
+# Fake Discord objects
+
+class FakeMessage:
+    ids = itertools.count(1)
+
+    def __init__(self, channel):
+        self.id = next(self.ids)
+        self.channel = channel
+
+    async def edit(self, **kwargs):
+        self.channel.edited += 1
+        return self
+
+class FakeTextChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.sent = 0
+        self.edited = 0
+
+    async def send(self, *args, **kwargs):
+        self.sent += 1
+        return FakeMessage(self)
+
+class FakeMember:
+    def __init__(self, member_id, channel=None, bot=False):
+        self.id = member_id
+        self.bot = bot
+        self.voice = type("VoiceState", (), {"channel": channel})() if channel else None
+
+class FakeAudioPlayer(threading.Thread):
+    """discord.py's AudioPlayer loop without the network: read, encode, sleep to the next 20 ms"""
+
+    def __init__(self, client, source, after):
+        super().__init__(daemon=True, name=f"player-{client.guild.id}")
+        self.client = client
+        self.source = source
+        self.after = after
+        self.encoder = discord.opus.Encoder() if discord.opus.is_loaded() else None
+        self._end = threading.Event()
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._lock = threading.Lock()
+
+    def run(self):
+        error = None
+        try:
+            loops = 0
+            start = time.perf_counter()
+            while not self._end.is_set():
+                if not self._resumed.is_set():
+                    self._resumed.wait()
+                    loops, start = 0, time.perf_counter()
+                    continue
+                with self._lock:
+                    source = self.source
+                data = source.read()
+                if not data:
+                    self.stop()
+                    break
+                if self.encoder and not source.is_opus():
+                    self.encoder.encode(data, self.encoder.SAMPLES_PER_FRAME)
+                self.client.frame_read()
+                loops += 1
+                time.sleep(max(0.0, start + FRAME_DELAY * loops - time.perf_counter()))
+        except Exception as e:
+            error = e
+        finally:
+            self.source.cleanup()
+            if self.after:
+                self.after(error)
+
+    def stop(self):
+        self._end.set()
+        self._resumed.set()
+
+    def pause(self):
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    def is_playing(self):
+        return self._resumed.is_set() and not self._end.is_set()
+
+    def is_paused(self):
+        return not self._end.is_set() and not self._resumed.is_set()
+
+    def set_source(self, source):
+        with self._lock:
+            self.source = source
+
+class FakeVoiceClient:
+    def __init__(self, bot, channel):
+        self.bot = bot
+        self.channel = channel
+        self.guild = channel.guild
+        self.loop = bot.loop
+        self._player = None
+        self.frames = 0
+        self.first_frame = bot.loop.create_future()
+
+    def frame_read(self):
+        self.frames += 1
+        if self.frames == 1:
+            self.loop.call_soon_threadsafe(self._first_frame, time.perf_counter())
+
+    def _first_frame(self, at):
+        if not self.first_frame.done():
+            self.first_frame.set_result(at)
+
+    def play(self, source, *, after=None, **kwargs):
+        if self.is_playing():
+            raise discord.ClientException("Already playing audio.")
+        self._player = FakeAudioPlayer(self, source, after)
+        self._player.start()
+
+    @property
+    def source(self):
+        return self._player.source if self._player else None
+
+    @source.setter
+    def source(self, value):
+        if self._player:
+            self._player.set_source(value)
+
+    def is_playing(self):
+        return self._player is not None and self._player.is_playing()
+
+    def is_paused(self):
+        return self._player is not None and self._player.is_paused()
+
+    def pause(self):
+        if self._player:
+            self._player.pause()
+
+    def resume(self):
+        if self._player:
+            self._player.resume()
+
+    def stop(self):
+        if self._player:
+            self._player.stop()
+            self._player = None
+
+    async def move_to(self, channel):
+        self.channel = channel
+        return self
+
+    async def disconnect(self, force=False):
+        self.stop()
+        self.guild.voice_client = None
+        if self in self.bot.voice_clients:
+            self.bot.voice_clients.remove(self)
+
+class FakeVoiceChannel:
+    def __init__(self, bot, guild, channel_id):
+        self.bot = bot
+        self.guild = guild
+        self.id = channel_id
+        self.members = []
+
+    async def connect(self, **kwargs):
+        client = FakeVoiceClient(self.bot, self)
+        self.guild.voice_client = client
+        self.bot.voice_clients.append(client)
+        return client
+
+class FakeGuild:
+    def __init__(self, bot, guild_id):
+        self.id = guild_id
+        self.name = f"Guild {guild_id}"
+        self.shard_id = 0
+        self.voice_client = None
+        self.text_channel = FakeTextChannel(guild_id * 10 + 1)
+        self.voice_channel = FakeVoiceChannel(bot, self, guild_id * 10 + 2)
+        self.listener = FakeMember(guild_id * 10 + 3, self.voice_channel)
+        self.voice_channel.members.append(self.listener)
+
+    async def change_voice_state(self, **kwargs):
+        pass
+
+class FakeContext:
+    def __init__(self, guild):
+        self.guild = guild
+        self.author = guild.listener
+        self.channel = guild.text_channel
+        self.interaction = None
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    async def send(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
+
+    async def defer(self):
+        pass  # Like commands.Context.defer() for a prefix command
+
+class FakeBot:
+    """What MusicCog uses of commands.Bot"""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.voice_clients = []
+        self.guilds = []
+        self.shard_id = None
+        self.latency = 0.0
+        self.guild_ids = itertools.count(1000)
+
+    def new_guild(self):
+        guild = FakeGuild(self, next(self.guild_ids))
+        self.guilds.append(guild)
+        return guild
+
+    def get_guild(self, guild_id):
+        return next((guild for guild in self.guilds if guild.id == guild_id), None)
+
+    def get_cog(self, name):
+        return None
+
+    def add_dynamic_items(self, *items):
+        pass
+
+    def remove_dynamic_items(self, *items):
+        pass
+
+    async def wait_until_ready(self):
+        pass
+
+# Phases
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)  # Reaped FFmpeg processes
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+async def start_guild(bot, cog, number, timeout):
+    """Play one fixture in a new guild; returns (ctx, seconds to the first frame)"""
+    guild = bot.new_guild()
+    ctx = FakeContext(guild)
+    started = time.perf_counter()
+    await cog.play(ctx, query=f"fixture {number}")
+    if guild.voice_client is None:
+        raise RuntimeError("play didn't connect to voice, see the messages above")
+    first = await asyncio.wait_for(guild.voice_client.first_frame, timeout)
+    return ctx, first - started
+
+async def finish_guild(bot, cog, ctx):
+    cog.evict_player(ctx.guild.id)
+    if ctx.voice_client:
+        await ctx.voice_client.disconnect()
+    bot.guilds.remove(ctx.guild)
+
+async def wait_idle(cog, contexts, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(cog.players[ctx.guild.id].is_idle() for ctx in contexts if ctx.guild.id in cog.players):
+            return
+        await asyncio.sleep(0.1)
+    raise TimeoutError("Players were still busy at the end of the run")
+
+async def measure_ttfa(bot, cog, runs, numbers, timeout):
+    timings = []
+    for _ in range(runs):
+        ctx, seconds = await start_guild(bot, cog, next(numbers), timeout)
+        timings.append(seconds)
+        await finish_guild(bot, cog, ctx)
+    return timings
+
+async def issue_commands(cog, contexts, interval, stop):
+    """Round robin of cheap commands across the playing guilds, timing each"""
+    commands = [
+        lambda ctx: cog.queue_(ctx),
+        lambda ctx: cog.nowplaying(ctx),
+        lambda ctx: cog.volume(ctx, percent=80),
+        lambda ctx: cog.filters(ctx),
+    ]
+    timings = []
+    for ctx, command in zip(itertools.cycle(contexts), itertools.cycle(commands)):
+        if stop.is_set():
+            break
+        started = time.perf_counter()
+        await command(ctx)
+        timings.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return timings
+
+async def measure_load(bot, cog, guilds, tracks, numbers, interval, timeout, track_seconds):
+    """N guilds each playing `tracks` fixtures back to back"""
+    cpu_before, wall_before = cpu_seconds(), time.perf_counter()
+    cog.loop_lag.max = 0.0
+    started = await asyncio.gather(*(start_guild(bot, cog, next(numbers), timeout) for _ in range(guilds)))
+    contexts = [ctx for ctx, _ in started]
+    for ctx in contexts:
+        for _ in range(tracks - 1):
+            await cog.play(ctx, query=f"fixture {next(numbers)}")
+
+    stop = asyncio.Event()
+    command_task = asyncio.create_task(issue_commands(cog, contexts, interval, stop))
+    try:
+        await wait_idle(cog, contexts, timeout + tracks * track_seconds * 2)
+    finally:
+        stop.set()
+        command_timings = await command_task
+    await asyncio.sleep(0.5)  # Let the last FFmpeg processes be reaped
+
+    cpu, wall = cpu_seconds() - cpu_before, time.perf_counter() - wall_before
+    audio_seconds = sum(ctx.voice_client.frames for ctx in contexts if ctx.voice_client) * FRAME_DELAY
+    for ctx in contexts:
+        await finish_guild(bot, cog, ctx)
+    return {
+        "ttfa": [seconds for _, seconds in started],
+        "cpu_percent_per_guild": cpu / wall / guilds * 100,
+        "cpu_ms_per_audio_minute": cpu / max(audio_seconds, 1e-9) * 60 * 1000,
+        "commands": command_timings,
+        "loop_lag_ms_max": cog.loop_lag.max * 1000,
+    }
+
+async def measure_memory(bot, cog, count, numbers, timeout):
+    """Traced bytes per track queued through the play command"""
+    ctx, _ = await start_guild(bot, cog, next(numbers), timeout)
+    ctx.voice_client.pause()
+    player = cog.players[ctx.guild.id]
+    count = min(count, player.queue.maxlen)
+    queries = [f"fixture {next(numbers)}" for _ in range(count)]
+    queued_before = len(player.queue)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for query in queries:
+        await cog.play(ctx, query=query)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    queued = len(player.queue) - queued_before
+    await finish_guild(bot, cog, ctx)
+    return used / max(queued, 1)
+
+async def run(args):
+    if not shutil.which("ffmpeg"):
+        raise SystemExit("FFmpeg is required for this benchmark")
+    if not discord.opus.is_loaded():
+        try:
+            discord.opus._load_default()
+        except Exception:
+            pass
+
+    with tempfile.TemporaryDirectory() as directory:
+        files, durations = [], []
+        for path in args.media or []:
+            name = f"{len(files)}-{os.path.basename(path)}"
+            os.symlink(os.path.abspath(path), os.path.join(directory, name))
+            files.append(name)
+            durations.append(None)
+        if not files:
+            write_fixture(os.path.join(directory, "fixture.wav"), args.track_seconds)
+            files, durations = ["fixture.wav"], [args.track_seconds]
+
+        server, base_url = await start_server(directory)
+        bot = FakeBot()
+        cog = MusicCog(bot)
+        for command in cog.walk_commands():
+            command.cog = cog  # What bot.add_cog would do, so the commands can be called directly
+        cog.resolver.shutdown()
+        cog.resolver = StubResolver(base_url, files, durations, args.resolve_ms / 1000)
+        await cog.cog_load()
+        numbers = itertools.count()
+        try:
+            ttfa = await measure_ttfa(bot, cog, args.runs, numbers, args.timeout)
+            longest = max(duration or 600 for duration in durations)
+            load = await measure_load(bot, cog, args.guilds, args.tracks, numbers,
+                                      args.command_interval, args.timeout, longest)
+            per_track = await measure_memory(bot, cog, args.queue, numbers, args.timeout)
+        finally:
+            await cog.cog_unload()
+            server.kill()
+            await server.wait()
+
+    commands = load["commands"]
+    return {
+        "config": {
+            "guilds": args.guilds, "tracks": args.tracks, "runs": args.runs, "media": files,
+            "opus_encoding": discord.opus.is_loaded(),
+            "env": {key: os.environ[key] for key in ("MIXER", "AUDIO_MODE", "AUDIO_NODES", "CROSSFADE_SECONDS")
+                    if key in os.environ},
+        },
+        "ttfa_ms_p50": statistics.median(ttfa) * 1000,
+        "ttfa_ms_p95": percentile(ttfa, 0.95) * 1000,
+        "load_ttfa_ms_p50": statistics.median(load["ttfa"]) * 1000,
+        "load_ttfa_ms_p95": percentile(load["ttfa"], 0.95) * 1000,
+        "cpu_percent_per_guild": load["cpu_percent_per_guild"],
+        "cpu_ms_per_audio_minute": load["cpu_ms_per_audio_minute"],
+        "bytes_per_queued_track": per_track,
+        "command_ms_p50": statistics.median(commands) * 1000 if commands else None,
+        "command_ms_p95": percentile(commands, 0.95) * 1000 if commands else None,
+        "command_ms_max": max(commands) * 1000 if commands else None,
+        "command_count": len(commands),
+        "loop_lag_ms_max": load["loop_lag_ms_max"],
+    }
+
+def report(results):
+    config = results["config"]
+    print(f"{config['guilds']} guilds x {config['tracks']} tracks, media {', '.join(config['media'])}, "
+          f"opus encoding {'on' if config['opus_encoding'] else 'off (libopus not found)'}")
+    print(f"time to first audio   p50 {results['ttfa_ms_p50']:8.1f} ms   p95 {results['ttfa_ms_p95']:8.1f} ms   (one guild)")
+    print(f"                      p50 {results['load_ttfa_ms_p50']:8.1f} ms   p95 {results['load_ttfa_ms_p95']:8.1f} ms   "
+          f"({config['guilds']} guilds at once)")
+    print(f"cpu per guild         {results['cpu_percent_per_guild']:8.2f} %    "
+          f"{results['cpu_ms_per_audio_minute']:8.1f} ms per audio minute")
+    print(f"memory per queued     {results['bytes_per_queued_track']:8.0f} B")
+    if results["command_count"]:
+        print(f"command latency       p50 {results['command_ms_p50']:8.2f} ms   p95 {results['command_ms_p95']:8.2f} ms   "
+              f"max {results['command_ms_max']:8.2f} ms   ({results['command_count']} commands)")
+    print(f"event loop lag        max {results['loop_lag_ms_max']:8.1f} ms")
+
+def compare(results, baseline, tolerance):
+    """Metrics more than tolerance worse than the baseline, as printable lines"""
+    regressions = []
+    for name in METRICS:
+        old, new = baseline.get(name), results.get(name)
+        if old is None or new is None:
+            continue
+        if new > old * (1 + tolerance) and new - old > 1e-6:
+            regressions.append(f"{name}: {old:.2f} -> {new:.2f} (+{(new / old - 1) * 100 if old else math.inf:.0f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--media", nargs="+", help="audio files to serve (default: a generated WAV sweep)")
+    parser.add_argument("--track-seconds", type=float, default=10, help="length of the generated fixture")
+    parser.add_argument("-g", "--guilds", type=int, default=10, help="guilds playing at once")
+    parser.add_argument("-t", "--tracks", type=int, default=1, help="tracks each guild plays")
+    parser.add_argument("-r", "--runs", type=int, default=5, help="single-guild time to first audio runs")
+    parser.add_argument("-q", "--queue", type=int, default=1000, help="tracks queued for the memory figure")
+    parser.add_argument("--resolve-ms", type=float, default=0, help="simulated extraction time")
+    parser.add_argument("--command-interval", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for first audio")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run; exit 1 if a metric regressed")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression, 0.2 = 20%%")
+    parser.add_argument("--serve", metavar="DIR", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(serve(args.serve, args.port))
+        return
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Cold vs warm yt-dlp benchmark.
+
+Compares building a fresh YoutubeDL per query (the old get_youtube_audio
+behaviour) against the long-lived per-worker instance from utils.extractor.
+
+    python -m benchmarks.extractor_bench              # instance setup cost only, offline
+    python -m benchmarks.extractor_bench -q "lofi"    # full extraction, needs network
+"""
+import argparse
+import time
+
+from utils import extractor
+
+def measure(func, runs):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for _ in range(runs):
+        func()
+    return (time.perf_counter() - wall) / runs, (time.process_time() - cpu) / runs
+
+def report(name, wall, cpu):
+    print(f"{name:<6} wall {wall * 1000:8.2f} ms   cpu {cpu * 1000:8.2f} ms   per call")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-q", "--query", help="also run a full extraction for this query")
+    parser.add_argument("-n", "--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    def cold_setup():
+        with extractor.new_ydl():
+            pass
+
+    extractor.warm_worker()
+    report("cold", *measure(cold_setup, args.runs))
+    report("warm", *measure(extractor.get_ydl, args.runs))
+
+    if args.query:
+        runs = max(1, args.runs // 4)
+        print(f"\nextract_info({args.query!r}), {runs} runs")
+        report("cold", *measure(lambda: extractor.get_youtube_audio_cold(args.query), runs))
+        extractor.get_youtube_audio(args.query)  # first warm call loads player JS
+        report("warm", *measure(lambda: extractor.get_youtube_audio(args.query), runs))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Opus passthrough vs PCM transcoding CPU benchmark.
+
+Reads a local file through both source types the way discord.py's
+AudioPlayer does (as fast as possible instead of every 20 ms) for N
+simulated guilds, and reports Python + FFmpeg CPU per minute of audio
+per guild. Use an Opus/webm file (e.g. a YouTube bestaudio download) to
+compare the remux path against decode + libopus re-encode.
+
+    python -m benchmarks.opus_bench song.webm --guilds 8
+"""
+import argparse
+import resource
+import time
+
+import discord
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def run(mode, path, guilds, encoder):
+    if mode == "opus":
+        sources = [discord.FFmpegOpusAudio(path, codec="copy", options="-vn") for _ in range(guilds)]
+    else:
+        sources = [discord.FFmpegPCMAudio(path, options="-vn") for _ in range(guilds)]
+
+    cpu = time.process_time()
+    ffmpeg_cpu = children_cpu()
+    frames = 0
+    live = list(sources)
+    while live:
+        for source in list(live):
+            data = source.read()
+            if not data:
+                live.remove(source)
+                continue
+            frames += 1
+            if encoder is not None and not source.is_opus():
+                encoder.encode(data, encoder.SAMPLES_PER_FRAME)
+    for source in sources:
+        source.cleanup()  # Reaps FFmpeg so its CPU shows up in RUSAGE_CHILDREN
+
+    if not frames:
+        raise SystemExit(f"FFmpeg produced no audio from {path}")
+    python_cpu = time.process_time() - cpu
+    ffmpeg_cpu = children_cpu() - ffmpeg_cpu
+    minutes = frames * 0.02 / 60 / guilds
+    return python_cpu / guilds / minutes, ffmpeg_cpu / guilds / minutes, minutes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="local audio file")
+    parser.add_argument("-g", "--guilds", type=int, default=4)
+    args = parser.parse_args()
+
+    encoder = None
+    if not discord.opus.is_loaded():
+        try:
+            discord.opus._load_default()
+        except Exception:
+            pass
+    if discord.opus.is_loaded():
+        encoder = discord.opus.Encoder()
+    else:
+        print("libopus not found: the PCM path is measured without discord.py's Opus encode\n")
+
+    print(f"{args.guilds} guild(s), CPU seconds per minute of audio per guild")
+    for mode in ("opus", "pcm"):
+        python_cpu, ffmpeg_cpu, minutes = run(mode, args.path, args.guilds, encoder)
+        print(
+            f"{mode:<5} python {python_cpu:6.3f} s   ffmpeg {ffmpeg_cpu:6.3f} s   "
+            f"total {python_cpu + ffmpeg_cpu:6.3f} s   ({minutes:.1f} min of audio)"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Memory per 10k queued tracks: old per-track dicts vs slotted Track.
+
+Strings are built before measuring, since both layouts hold the same
+title/URL strings; what's measured is the per-track container overhead.
+
+    python -m benchmarks.track_memory -n 10000
+"""
+import argparse
+import tracemalloc
+
+from utils.track import Track
+
+def measure(build, count, fields):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [build(*row) for row in fields]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    assert len(items) == count
+    return used
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--count", type=int, default=10000)
+    args = parser.parse_args()
+
+    fields = [
+        (
+            f"vid{i:08d}",
+            f"Artist {i % 500} - Song number {i}",
+            f"https://www.youtube.com/watch?v=vid{i:08d}",
+            200 + i % 300,
+            i,
+        )
+        for i in range(args.count)
+    ]
+
+    def old_dict(video_id, title, page, duration, requester):
+        # What MusicPlayer.queue held before: url, title, webpage_url only
+        return {"url": page, "title": title, "webpage_url": page}
+
+    def full_dict(video_id, title, page, duration, requester):
+        return {
+            "id": video_id, "title": title, "webpage_url": page, "duration": duration,
+            "url": None, "acodec": None, "asr": None, "expires_at": None, "requester_id": requester,
+        }
+
+    def track(video_id, title, page, duration, requester):
+        return Track(video_id, title, page, duration, requester_id=requester)
+
+    print(f"{args.count} tracks, container memory")
+    for name, build in (("dict (3 fields, old)", old_dict), ("dict (9 fields)", full_dict), ("Track (9 fields)", track)):
+        used = measure(build, args.count, fields)
+        print(f"{name:<22} {used / 1024:9.1f} KiB   {used / args.count:6.1f} B/track")
+
+if __name__ == "__main__":
+    main()
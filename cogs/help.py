@@ -3,6 +3,8 @@ import discord
 from discord.ext import commands
 from discord import app_commands, ui
 
+from utils.render import static_embed
+
 ORANGE_COLOR = 0xFFA500  # Orange color for embeds
 
 class HelpView(ui.View):
@@ -18,10 +20,26 @@ class HelpView(ui.View):
 class HelpCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.view = None  # One HelpView for every message, it only holds a link button
+
+    def help_view(self):
+        if self.view is None:
+            self.view = HelpView()
+        return self.view
 
     @commands.command(name="help")
     async def help_command(self, ctx):
         """Show all available commands"""
+        await ctx.send(embed=static_embed("help", self.build_help_embed), view=self.help_view())
+
+    @app_commands.command(name="help", description="Show all available commands")
+    async def slash_help(self, interaction: discord.Interaction):
+        """Show all available commands (slash command)"""
+        await interaction.response.send_message(
+            embed=static_embed("slash_help", self.build_slash_help_embed), view=self.help_view()
+        )
+
+    def build_help_embed(self):
         embed = discord.Embed(
             title="🎵 BeatMate - Command List",
             description="Here are all available commands for the music bot!",
@@ -32,13 +50,18 @@ class HelpCog(commands.Cog):
         embed.add_field(
             name="🎵 Music Commands",
             value=(
-                "`r!play <song>` - Play a song from YouTube\n"
+                "`r!play <song>` - Play a song or playlist from YouTube\n"
                 "`r!pause` - Pause the current song\n"
                 "`r!resume` - Resume the paused song\n"
                 "`r!skip` - Skip to the next song\n"
+                "`r!seek <time>` - Jump to a position, e.g. `1:30` or `+30`\n"
                 "`r!stop` - Stop music and disconnect\n"
                 "`r!queue` - Show the current queue\n"
+                "`r!shuffle` / `r!dedupe` - Shuffle or de-duplicate the queue\n"
+                "`r!remove <pos>` / `r!move <from> <to>` - Edit the queue\n"
                 "`r!nowplaying` - Show currently playing song\n"
+                "`r!volume <0-200>` / `r!bass [dB]` - Volume and bass boost\n"
+                "`r!nightcore` / `r!normalize` / `r!filters [reset]` - Audio filters\n"
                 "`r!247` - Enable 24/7 mode in voice channel\n"
                 "`r!panel` - Show music control panel"
             ),
@@ -81,13 +104,9 @@ class HelpCog(commands.Cog):
         
         embed.set_footer(text="Need help? Join our support server!")
         embed.set_thumbnail(url=self.bot.user.avatar.url if self.bot.user.avatar else None)
-        
-        view = HelpView()
-        await ctx.send(embed=embed, view=view)
+        return embed
 
-    @app_commands.command(name="help", description="Show all available commands")
-    async def slash_help(self, interaction: discord.Interaction):
-        """Show all available commands (slash command)"""
+    def build_slash_help_embed(self):
         embed = discord.Embed(
             title="🎵 BeatMate - Command List",
             description="Here are all available commands for the music bot!",
@@ -98,13 +117,18 @@ class HelpCog(commands.Cog):
         embed.add_field(
             name="🎵 Music Commands",
             value=(
-                "`/play <song>` - Play a song from YouTube\n"
+                "`/play <song>` - Play a song or playlist from YouTube\n"
                 "`/pause` - Pause the current song\n"
                 "`/resume` - Resume the paused song\n"
                 "`/skip` - Skip to the next song\n"
+                "`/seek <time>` - Jump to a position, e.g. `1:30` or `+30`\n"
                 "`/stop` - Stop music and disconnect\n"
                 "`/queue` - Show the current queue\n"
+                "`/shuffle` / `/dedupe` - Shuffle or de-duplicate the queue\n"
+                "`/remove <pos>` / `/move <from> <to>` - Edit the queue\n"
                 "`/nowplaying` - Show currently playing song\n"
+                "`/volume <0-200>` / `/bass <dB>` - Volume and bass boost\n"
+                "`/nightcore` / `/normalize` / `/filters` - Audio filters\n"
                 "`/247` - Enable 24/7 mode in voice channel\n"
                 "`r!panel` - Show music control panel"
             ),
@@ -147,9 +171,7 @@ class HelpCog(commands.Cog):
         
         embed.set_footer(text="Need help? Join our support server!")
         embed.set_thumbnail(url=self.bot.user.avatar.url if self.bot.user.avatar else None)
-        
-        view = HelpView()
-        await interaction.response.send_message(embed=embed, view=view)
+        return embed
 
 async def setup(bot):
     await bot.add_cog(HelpCog(bot))
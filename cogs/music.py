@@ -1,110 +1,424 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands, ui
-import yt_dlp as ytdl
 import asyncio
-import subprocess
+import math
+import os
 import random
+import time
+
+from utils.audio import AUDIO_MODE, TrackedSource, create_source, is_remote
+from utils.diskcache import create_audio_cache
+from utils.dsp import BASS_MAX_DB, NIGHTCORE_RATE, VOLUME_MAX, AudioFilters, FilteredSource
+from utils.extractor import playlist_url
+from utils.mixer import CROSSFADE_SECONDS, MIXER_MODE, MixerSource
+from utils.ffmpeg import FFmpegCapabilities
+from utils.loop_monitor import LoopLagMonitor
+from utils.metrics import (
+    COMMAND_SECONDS, FFMPEG_SPAWN_SECONDS, INTERACTION_ACK_SECONDS, REGISTRY, TIME_TO_FIRST_AUDIO
+)
+from utils.nodes import NodeUnavailable, create_node_pool
+from utils.render import PersistentMessage, QueueNotifier
+from utils.resolver import Resolver, ResolverBusy, ResolverCancelled, UpstreamUnavailable
+from utils.state import STATE_FLUSH_INTERVAL, STATE_SNAPSHOT_INTERVAL, create_state_store
+from utils.track_queue import QueueFull, TrackQueue
 
 ORANGE_COLOR = 0xFFA500  # Orange color for embeds
+PREFETCH_COUNT = int(os.getenv("PREFETCH_COUNT", 1))  # Queue entries resolved ahead of playback
+PLAYLIST_PROGRESS_INTERVAL = 3  # Seconds between edits of the playlist progress message
+IDLE_TIMEOUT = int(os.getenv("IDLE_TIMEOUT", 300))  # Seconds a player may sit idle before it is removed
+EMPTY_CHANNEL_TIMEOUT = int(os.getenv("EMPTY_CHANNEL_TIMEOUT", 120))  # Seconds alone in voice before leaving
+REAPER_INTERVAL = 30
+RESUME_ATTEMPTS = 2  # Times a track whose stream broke is resumed from its position
+RESUME_MARGIN = 5  # Seconds short of the duration an ending counts as a broken stream
+POSITION_SAVE_INTERVAL = 10  # Seconds between stored playback positions
+RESTORE_CONCURRENCY = 5  # Voice connections opened at once when restoring after a restart
 
-# --- Helper to check if ffmpeg is installed ---
-def is_ffmpeg_installed():
-    try:
-        subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        return True
-    except Exception:
-        return False
-
-def get_youtube_audio(query):
-    ytdl_opts = {
-        "format": "bestaudio[abr<=320]/bestaudio[ext=webm]/bestaudio[ext=m4a]/bestaudio/best",
-        "noplaylist": True,
-        "default_search": "ytsearch",
-        "quiet": True,
-        "extract_flat": False,
-        "forceurl": True,
-        "skip_download": True,
-        "source_address": "0.0.0.0",
-        "prefer_ffmpeg": True,
-        "extractor_args": {
-            "youtube": {
-                "player_client": ["web"],
-                "player_skip": ["configs", "webpage"],
-                "skip": ["dash", "hls"]
-            }
-        },
-        "http_headers": {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        }
-    }
-    with ytdl.YoutubeDL(ytdl_opts) as ydl:
-        info = ydl.extract_info(query, download=False)
-        if "entries" in info:
-            info = info["entries"][0]
-        return {
-            "url": info["url"],
-            "title": info.get("title", "Unknown Title"),
-            "webpage_url": info.get("webpage_url", query)
-        }
+def resolver_error_embed(e):
+    if isinstance(e, ResolverBusy):
+        return discord.Embed(title="⏳ Busy", description=str(e), color=ORANGE_COLOR)
+    if isinstance(e, UpstreamUnavailable):
+        return discord.Embed(title="🚦 YouTube Unavailable", description=str(e), color=ORANGE_COLOR)
+    return discord.Embed(title="❌ Error", description=f"Could not get audio: {e}", color=ORANGE_COLOR)
+
+def format_time(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
+
+def parse_time(text, current=0):
+    """Seconds from "90", "1:30" or "1:02:03"; a leading + or - is relative to current.
+
+    Raises ValueError for anything else, including nan, inf and negative parts.
+    """
+    sign = text[:1] if text[:1] in "+-" else ""
+    seconds = 0
+    for part in text[len(sign):].split(":"):
+        value = float(part)
+        if not math.isfinite(value) or value < 0:
+            raise ValueError(f"Not a time: {text}")
+        seconds = seconds * 60 + value
+    if sign == "+":
+        return current + seconds
+    if sign == "-":
+        return max(current - seconds, 0)
+    return seconds
+
+class ChannelContext:
+    """Stands in for a commands.Context when playback starts without a command (state restore)"""
+
+    def __init__(self, guild, channel):
+        self.guild = guild
+        self.channel = channel
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    async def send(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
+
+class Invocation:
+    """Stands in for a commands.Context when a slash command or button runs a command's handler.
+
+    Built straight from the interaction, so nothing is fetched or parsed.
+    The first reply answers the interaction; replies after that, or after
+    defer(), are sent as followups.
+    """
+
+    __slots__ = ("interaction", "guild", "channel", "author", "via", "ephemeral")
+
+    def __init__(self, interaction, via="slash", ephemeral=False):
+        self.interaction = interaction
+        self.guild = interaction.guild
+        self.channel = interaction.channel
+        self.author = interaction.user
+        self.via = via  # Entry point, for metrics
+        self.ephemeral = ephemeral
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client if self.guild else None
+
+    def acknowledged(self):
+        elapsed = (discord.utils.utcnow() - self.interaction.created_at).total_seconds()
+        INTERACTION_ACK_SECONDS.observe(elapsed, via=self.via)
+
+    async def defer(self):
+        """Acknowledge now, for handlers that may take longer than Discord's 3 s to reply"""
+        if not self.interaction.response.is_done():
+            await self.interaction.response.defer(ephemeral=self.ephemeral)
+            self.acknowledged()
+
+    async def send(self, *args, **kwargs):
+        kwargs.setdefault("ephemeral", self.ephemeral)
+        response = self.interaction.response
+        if not response.is_done():
+            await response.send_message(*args, **kwargs)
+            self.acknowledged()
+            return None
+        return await self.interaction.followup.send(*args, wait=True, **kwargs)
 
 class MusicPlayer:
-    def __init__(self, bot, guild):
+    def __init__(self, bot, guild, resolver, ffmpeg, audio_cache=None, state=None, nodes=None, panel=None):
         self.bot = bot
         self.guild = guild
-        self.queue = asyncio.Queue()
+        self.resolver = resolver
+        self.ffmpeg = ffmpeg  # Shared FFmpegCapabilities, probed at startup
+        self.audio_cache = audio_cache  # Optional on-disk cache of hot tracks
+        self.state = state  # Optional StateStore the queue and now playing are saved to
+        self.nodes = nodes  # Optional NodePool of audio worker processes
+        listener = state.queue_listener(guild.id) if state else None
+        self.queue = TrackQueue(listener=listener)  # Track references, resolved just before playback
         self.now_playing = None
+        self.source = None  # TrackedSource (or MixerSource) being played, for the position
+        self.start_at = None  # (video id, seconds) to resume a restored track from
+        self.dequeued_at = None  # When the upcoming track was taken off the queue
         self.voice_client = None
         self.player_task = None
+        self.prefetch_tasks = set()
+        self.prefetching = set()  # Page URLs currently being resolved ahead of time
         self.play_next_song = asyncio.Event()
+        self.filters = AudioFilters()  # Live volume/EQ/rate settings for this guild
+        self.now_playing_message = PersistentMessage()  # Edited for each track instead of posting anew
+        self.panel = panel  # The shared control panel view
+        self.queue_notifier = QueueNotifier()
+        self.last_active = time.monotonic()
 
-    async def player_loop(self, ctx):
-        while True:
-            self.play_next_song.clear()
-            track = await self.queue.get()
-            self.now_playing = track
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def is_idle(self):
+        """Nothing playing, paused or queued"""
+        return not (self.now_playing or self.is_playing() or self.is_paused() or len(self.queue))
+
+    def prefetch(self):
+        """Resolve the next queue entries in the background so their streams are cached"""
+        for ref in self.queue.peek(PREFETCH_COUNT):
+            if ref.webpage_url in self.prefetching:
+                continue
+            if self.audio_cache and ref.id in self.audio_cache.files:
+                continue
+            self.prefetching.add(ref.webpage_url)
+            task = self.bot.loop.create_task(self._prefetch_one(ref.webpage_url))
+            self.prefetch_tasks.add(task)
+            task.add_done_callback(self.prefetch_tasks.discard)
+
+    async def _prefetch_one(self, url):
+        try:
+            await self.resolver.resolve(self.guild.id, url)
+        except Exception:
+            pass  # player_loop retries and reports the error when the track comes up
+        finally:
+            self.prefetching.discard(url)
+
+    async def next_track(self, ctx):
+        """Take the next queue entry and resolve it (disk cache first); None if that failed"""
+        ref = await self.queue.get()
+        self.dequeued_at = time.perf_counter()
+        local_path = self.audio_cache.get(ref.id) if self.audio_cache else None
+        try:
+            if local_path:
+                # Codec unknown here, create_source probes the local file
+                return ref.with_stream(local_path)
+            resolved = await self.resolver.resolve(self.guild.id, ref.webpage_url)
+            return resolved.with_requester(ref.requester_id)
+        except ResolverCancelled:
+            return None
+        except Exception as e:
+            embed = discord.Embed(
+                title="❌ Error",
+                description=f"Could not get audio for **{ref.title}**: {e}",
+                color=ORANGE_COLOR
+            )
+            await ctx.send(embed=embed)
+            return None
+
+    async def open_source(self, ctx, track, mode=AUDIO_MODE, start=0):
+        # Only pass flags and modes the installed FFmpeg supports; -reconnect is for network inputs
+        mode = self.ffmpeg.audio_mode(mode)
+        options = dict(
+            executable=self.ffmpeg.path or self.ffmpeg.executable,
+            before_options=self.ffmpeg.before_options() if is_remote(track) else "",
+            options=self.ffmpeg.options()
+        )
+        if self.nodes and not self.use_mixer():
+            # The node decides between passthrough and filtering itself
+            mode = "pcm" if self.filters.active else self.ffmpeg.audio_mode(AUDIO_MODE)
             try:
-                # Simplified FFmpeg options for maximum compatibility
-                ffmpeg_options = {
-                    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
-                    'options': '-vn'
-                }
-                source = discord.FFmpegPCMAudio(
-                    track["url"],
-                    executable="ffmpeg",
-                    **ffmpeg_options
+                source = self.nodes.play(self.guild.id, track, self.filters, start, mode=mode, **options)
+                return TrackedSource(source, start)
+            except NodeUnavailable:
+                pass  # Play it in this process instead
+        try:
+            with FFMPEG_SPAWN_SECONDS.time(mode=mode):
+                source = await create_source(track, mode=mode, start=start, **options)
+            return TrackedSource(source, start)
+        except Exception as e:
+            if 'ffmpeg' in str(e).lower():
+                await ctx.send(
+                    "❌ **FFmpeg was not found!**\n"
+                    "Please ensure FFmpeg is installed and available in your system PATH or environment.\n"
+                    "See: https://ffmpeg.org/download.html"
                 )
-            except Exception as e:
-                if 'ffmpeg' in str(e).lower():
-                    await ctx.send(
-                        "❌ **FFmpeg was not found!**\n"
-                        "Please ensure FFmpeg is installed and available in your system PATH or environment.\n"
-                        "See: https://ffmpeg.org/download.html"
-                    )
-                else:
-                    await ctx.send(f"Error playing track: {e}")
-                self.now_playing = None
+            else:
+                await ctx.send(f"Error playing track: {e}")
+            return None
+
+    async def announce(self, ctx, track):
+        """Mark a track as playing and post the now playing panel"""
+        self.now_playing = track
+        self.touch()
+        self.prefetch()
+        if self.state:
+            self.state.update_guild(self.guild.id, now_playing=track, position=self.position)
+        if self.audio_cache and is_remote(track):
+            self.audio_cache.record_play(track)
+
+        # Create embed for now playing with song name as title
+        embed = discord.Embed(
+            title=f"🎵 {track.title}",
+            description="**Now Playing**",
+            color=ORANGE_COLOR,
+            url=track.webpage_url
+        )
+        embed.set_footer(text="Use the buttons below to control playback")
+
+        await self.now_playing_message.update(ctx, embed=embed, view=self.panel)
+
+    def filters_changed(self):
+        """Pass new filter settings on to the audio node playing this guild, if any"""
+        if self.nodes:
+            self.nodes.update_filters(self.guild.id, self.filters)
+
+    def needs_decoding(self):
+        """True if filters are on but the playing track is passed through undecoded"""
+        return bool(self.now_playing and self.source and self.passthrough and self.filters.active)
+
+    async def apply_filters(self, ctx):
+        """Apply changed filters to the playing track.
+
+        A passthrough track is reopened as PCM where it is, so the filters
+        can be heard straight away instead of from the next track.
+        """
+        self.filters_changed()
+        if self.needs_decoding():
+            await self.seek(ctx, self.position, mode="pcm")
+
+    def use_mixer(self):
+        return MIXER_MODE == "on" or (MIXER_MODE == "auto" and CROSSFADE_SECONDS > 0)
+
+    async def player_loop(self, ctx):
+        pending = None  # Preloaded by the mixer but never started, e.g. after a skip
+        while True:
+            if pending:
+                self.dequeued_at = None  # Preloaded long ago, no time to first audio to measure
+            track = pending or await self.next_track(ctx)
+            pending = None
+            if track is None:
                 continue
+            if self.use_mixer():
+                pending = await self.play_mixed(ctx, track)
+            else:
+                await self.play_direct(ctx, track)
+            self.now_playing = None
+            self.source = None
+            self.touch()
+            if self.state and self.queue.empty():
+                self.state.update_guild(self.guild.id, now_playing=None, position=0)
+
+    @property
+    def position(self):
+        """Seconds into the playing track"""
+        return self.source.position if self.source and self.now_playing else 0
+
+    @property
+    def passthrough(self):
+        """Current track is streamed as Opus without decoding, so unfiltered"""
+        return bool(getattr(self.source, "passthrough", False))
+
+    def wrap(self, source):
+        """What is handed to the voice client for a source from open_source()"""
+        return source if source.is_opus() else FilteredSource(source, self.filters)
+
+    async def play_direct(self, ctx, track):
+        """One FFmpeg source per track; allows the Opus passthrough path.
+
+        If the stream dies early, the track is re-resolved and resumed from
+        where it stopped, up to RESUME_ATTEMPTS times.
+        """
+        start = self.take_start(track)
+        for attempt in range(RESUME_ATTEMPTS + 1):
+            # Filters need PCM; with none set, Opus tracks skip decoding entirely
+            source = await self.open_source(ctx, track, mode="pcm" if self.filters.active else AUDIO_MODE, start=start)
+            if source is None:
+                return
+            self.source = source
+            if attempt == 0:
+                source.on_first_frame = self.record_first_audio
+            self.play_next_song.clear()
             ctx.voice_client.play(
-                source,
+                self.wrap(source),
                 after=lambda e: self.bot.loop.call_soon_threadsafe(self.play_next_song.set)
             )
-            
-            # Create embed for now playing with song name as title
-            embed = discord.Embed(
-                title=f"🎵 {track['title']}",
-                description="**Now Playing**",
-                color=ORANGE_COLOR,
-                url=track['webpage_url']
-            )
-            embed.set_footer(text="Use the buttons below to control playback")
-            
-            # Create music control panel
-            view = MusicControlPanel(self.bot)
-            await ctx.send(embed=embed, view=view)
-            
+            if attempt == 0:
+                await self.announce(ctx, track)
             await self.play_next_song.wait()
-            self.now_playing = None
+
+            # self.source may have been replaced by a seek
+            if not self.ended_early(track, self.source) or not ctx.voice_client:
+                return
+            start = self.source.position
+            try:
+                track = (await self.resolver.resolve(self.guild.id, track.webpage_url, refresh=True)).with_requester(track.requester_id)
+            except Exception:
+                return
+            self.now_playing = track
+
+    async def play_mixed(self, ctx, track):
+        """Play tracks back to back through one MixerSource until the queue runs dry.
+
+        Returns a track that was preloaded but never started, or None.
+        """
+        start = self.take_start(track)
+        source = await self.open_source(ctx, track, mode="pcm", start=start)
+        if source is None:
+            return None
+        events = asyncio.Queue()
+        loop = self.bot.loop
+
+        def notify(kind, current=None):
+            loop.call_soon_threadsafe(events.put_nowait, (kind, current))
+
+        source.on_first_frame = self.record_first_audio
+        mixer = MixerSource(notify)
+        mixer.start(track, source, start)
+        self.source = mixer
+        ctx.voice_client.play(FilteredSource(mixer, self.filters), after=lambda e: notify("ended"))
+        try:
+            await self.announce(ctx, track)
+            while True:
+                kind, current = await events.get()
+                if kind == "ended":
+                    return mixer.pending_track()
+                if kind == "switched":
+                    await self.announce(ctx, current)
+                    continue
+                # near_end: open the next track now so the switch is seamless
+                while not self.queue.empty():
+                    upcoming = await self.next_track(ctx)
+                    source = upcoming and await self.open_source(ctx, upcoming, mode="pcm")
+                    if source:
+                        mixer.queue_next(upcoming, source)
+                        break
+        finally:
+            mixer.cleanup()
+
+    def record_first_audio(self):
+        """TrackedSource callback, run on the voice (or mixer decoder) thread"""
+        dequeued_at, self.dequeued_at = self.dequeued_at, None
+        if dequeued_at is not None:
+            TIME_TO_FIRST_AUDIO.observe(time.perf_counter() - dequeued_at)
+
+    def take_start(self, track):
+        """Where to start track: its restored position if it was playing at shutdown, else 0"""
+        start_at, self.start_at = self.start_at, None
+        if start_at and start_at[0] == track.id:
+            return start_at[1]
+        return 0
+
+    def ended_early(self, track, source):
+        """The source ran out well before the track's duration: the stream broke"""
+        if not source.ended or not track.duration or not is_remote(track):
+            return False
+        return source.position < track.duration - RESUME_MARGIN
+
+    async def seek(self, ctx, seconds, mode=None):
+        """Restart the playing track seconds in, using FFmpeg input seeking"""
+        track = self.now_playing
+        vc = ctx.voice_client
+        if isinstance(self.source, MixerSource):
+            source = await self.open_source(ctx, track, mode="pcm", start=seconds)
+            if source:
+                self.source.seek(track, source, seconds)
+            return source is not None
+
+        old = self.source
+        if mode is None:
+            mode = "opus" if old.is_opus() else "pcm"
+        source = await self.open_source(ctx, track, mode=mode, start=seconds)
+        if source is None:
+            return False
+        if not vc or not (vc.is_playing() or vc.is_paused()):
+            source.cleanup()
+            return False
+        paused = vc.is_paused()
+        self.source = source
+        vc.source = self.wrap(source)
+        if paused:
+            vc.pause()  # Swapping the source resumes playback
+        old.cleanup()
+        return True
 
     def is_playing(self):
         return self.voice_client and self.voice_client.is_playing()
@@ -112,13 +426,76 @@ class MusicPlayer:
     def is_paused(self):
         return self.voice_client and self.voice_client.is_paused()
 
+    def pause(self):
+        """False if nothing is playing"""
+        vc = self.guild.voice_client
+        if not vc or not vc.is_playing():
+            return False
+        vc.pause()
+        return True
+
+    def resume(self):
+        """False if nothing is paused"""
+        vc = self.guild.voice_client
+        if not vc or not vc.is_paused():
+            return False
+        vc.resume()
+        return True
+
+    def skip(self):
+        """Move on to the next track; False if nothing is playing.
+
+        When the mixer already has the next track open it switches to it on
+        the same voice stream; otherwise stopping the voice client ends the
+        track and the player loop opens the next one.
+        """
+        vc = self.guild.voice_client
+        if not vc or not vc.is_playing():
+            return False
+        if not (isinstance(self.source, MixerSource) and self.source.skip()):
+            vc.stop()
+        return True
+
+    def status(self):
+        """JSON-friendly summary of this guild's playback, for the status endpoint"""
+        track = self.now_playing
+        vc = self.guild.voice_client
+        return {
+            "guild_id": self.guild.id,
+            "voice_channel_id": vc.channel.id if vc else None,
+            "playing": bool(vc and vc.is_playing()),
+            "paused": bool(vc and vc.is_paused()),
+            "now_playing": {
+                "id": track.id,
+                "title": track.title,
+                "url": track.webpage_url,
+                "duration": track.duration,
+                "position": round(self.position, 1),
+            } if track else None,
+            "queued": len(self.queue),
+            "filters": {
+                "volume": self.filters.volume,
+                "normalize": self.filters.normalize,
+                "bass_db": self.filters.bass_db,
+                "rate": self.filters.rate,
+            },
+        }
+
     def cleanup(self):
         try:
             self.voice_client.stop()
         except Exception:
             pass
-        self.queue = asyncio.Queue()
+        for task in list(self.prefetch_tasks):
+            task.cancel()
+        self.queue_notifier.cancel()
+        self.now_playing_message.forget()
+        # The queue is reused, so the old loop must not keep waiting on it
+        if self.player_task:
+            self.player_task.cancel()
+        self.queue.clear()
         self.now_playing = None
+        self.source = None
         self.player_task = None
 
 class MusicCog(commands.Cog):
@@ -126,6 +503,279 @@ class MusicCog(commands.Cog):
         self.bot = bot
         self.players = {}
         self.last_channels = {}  # Store last voice channels for auto-reconnect
+        self.resolver = Resolver()  # Runs yt-dlp off the event loop
+        self.ffmpeg = FFmpegCapabilities()
+        self.audio_cache = create_audio_cache(self.resolver.upstream)  # None unless AUDIO_CACHE_DIR is set
+        self.always_on = set()  # Guilds in 24/7 mode, never disconnected for being idle or alone
+        self.alone_since = {}  # guild_id -> when its voice channel last became empty of listeners
+        self.state = create_state_store()  # None unless STATE_DB is set
+        self.loop_lag = LoopLagMonitor()
+        self.nodes = create_node_pool()  # None unless AUDIO_NODES is set
+        self.restored = False
+
+    async def cog_load(self):
+        await self.ffmpeg.refresh()
+        # Cogs load before bot.start(), so use the running loop rather than bot.loop
+        self.warm_task = asyncio.create_task(self.resolver.warm_up())
+        self.register_metrics()
+        # Buttons are dispatched by custom_id, so the views below are never stored per message
+        self.bot.add_dynamic_items(PanelButton)
+        self.control_panel = panel_view("control")
+        self.music_panel = panel_view("panel")
+        self.reap_idle_players.start()
+        self.loop_lag.start()
+        if self.nodes:
+            await self.nodes.start()
+        if self.state:
+            await self.state.open()
+            self.flush_state.start()
+            self.snapshot_state.start()
+
+    async def ffmpeg_available(self):
+        """Use the startup probe, re-probing only if FFmpeg was missing"""
+        if not self.ffmpeg.available:
+            await self.ffmpeg.refresh()
+        return self.ffmpeg.available
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(PanelButton)
+        self.reap_idle_players.cancel()
+        self.loop_lag.stop()
+        self.warm_task.cancel()
+        if self.state:
+            self.flush_state.cancel()
+            self.snapshot_state.cancel()
+            # Save before evicting, which clears the queues
+            await self.save_state()
+            await self.state.close()
+            for player in self.players.values():
+                player.queue.listener = None
+        for gid in list(self.players):
+            self.evict_player(gid, keep_state=True)
+        if self.nodes:
+            await self.nodes.close()
+        self.resolver.shutdown()
+        if self.audio_cache:
+            self.audio_cache.shutdown()
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.evict_player(guild.id)
+        self.always_on.discard(guild.id)
+        self.last_channels.pop(guild.id, None)
+        if self.state:
+            self.state.forget(guild.id)
+
+    def remember_channel(self, guild_id, channel_id):
+        """Store the voice channel to auto-reconnect (and restore) to"""
+        self.last_channels[guild_id] = channel_id
+        if self.state:
+            self.state.update_guild(guild_id, voice_channel_id=channel_id)
+
+    def set_always_on(self, guild_id, enabled):
+        if enabled:
+            self.always_on.add(guild_id)
+        else:
+            self.always_on.discard(guild_id)
+        if self.state:
+            self.state.update_guild(guild_id, always_on=int(enabled))
+
+    def evict_player(self, guild_id, keep_state=False):
+        """Stop a guild's player, cancel its tasks and pending resolutions, and forget it.
+
+        Its stored queue and now playing are deleted too, so a restart doesn't
+        bring back what was stopped; keep_state is for shutdown, where they
+        are meant to be resumed.
+        """
+        player = self.players.pop(guild_id, None)
+        if player:
+            player.cleanup()
+        self.resolver.cancel_guild(guild_id)
+        if self.nodes:
+            self.nodes.forget(guild_id)
+        if self.state and not keep_state:
+            self.state.forget(guild_id)
+            if guild_id in self.always_on and guild_id in self.last_channels:
+                # A 24/7 guild still rejoins its channel after a restart
+                self.state.update_guild(guild_id, voice_channel_id=self.last_channels[guild_id], always_on=1)
+
+    @tasks.loop(seconds=REAPER_INTERVAL)
+    async def reap_idle_players(self):
+        """Leave voice channels that have been empty a while and drop players that have gone idle"""
+        now = time.monotonic()
+        # Every connection, including those auto-reconnect opened without a player
+        voice_clients = list(self.bot.voice_clients)
+        connected = {vc.guild.id for vc in voice_clients}
+        for gid in list(self.alone_since):
+            if gid not in connected:
+                del self.alone_since[gid]
+        for vc in voice_clients:
+            gid = vc.guild.id
+            if gid in self.always_on or any(not m.bot for m in vc.channel.members):
+                self.alone_since.pop(gid, None)
+            elif now - self.alone_since.setdefault(gid, now) >= EMPTY_CHANNEL_TIMEOUT:
+                await self.leave_voice(vc)
+
+        for gid, player in list(self.players.items()):
+            # Only the player is freed; a channel with listeners keeps the bot
+            if player.is_idle() and now - player.last_active >= IDLE_TIMEOUT:
+                self.evict_player(gid)
+
+    async def leave_voice(self, vc):
+        """Disconnect for good: the player is evicted and the channel not rejoined"""
+        gid = vc.guild.id
+        self.evict_player(gid)
+        self.last_channels.pop(gid, None)
+        self.alone_since.pop(gid, None)
+        await vc.disconnect()
+
+    @reap_idle_players.before_loop
+    async def before_reap_idle_players(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(seconds=STATE_FLUSH_INTERVAL)
+    async def flush_state(self):
+        """Write queue changes logged since the last flush, and now and then the positions"""
+        if self.flush_state.current_loop % max(int(POSITION_SAVE_INTERVAL / STATE_FLUSH_INTERVAL), 1) == 0:
+            for gid, player in self.players.items():
+                if player.now_playing:
+                    self.state.update_guild(gid, position=player.position)
+        try:
+            await self.state.flush()
+        except Exception as e:
+            print(f"Error saving player state: {e}")
+
+    @tasks.loop(seconds=STATE_SNAPSHOT_INTERVAL)
+    async def snapshot_state(self):
+        if self.snapshot_state.current_loop == 0:
+            return  # Nothing to compact right after startup
+        try:
+            await self.save_state()
+        except Exception as e:
+            print(f"Error saving player state: {e}")
+
+    async def save_state(self):
+        """Snapshot every player's queue and position, replacing the change log"""
+        queues = {gid: list(player.queue) for gid, player in self.players.items()}
+        guilds = {
+            gid: {"now_playing": player.now_playing, "position": player.position}
+            for gid, player in self.players.items()
+        }
+        await self.state.snapshot(queues, guilds)
+
+    async def restore_state(self):
+        """Rejoin stored voice channels and queue their tracks again; runs once per process.
+
+        Only track references are stored, so nothing is resolved up front:
+        each guild's first track is resolved when its player starts, the
+        rest as they come up.
+        """
+        if not self.state or self.restored:
+            return
+        self.restored = True
+        states = await self.state.load()
+        limit = asyncio.Semaphore(RESTORE_CONCURRENCY)
+        await asyncio.gather(*(self.restore_guild(state, limit) for state in states.values()))
+
+    async def restore_guild(self, state, limit):
+        guild = self.bot.get_guild(state.guild_id)
+        if guild is None:
+            return
+        if state.voice_channel_id:
+            self.last_channels[guild.id] = state.voice_channel_id
+        if state.always_on:
+            self.always_on.add(guild.id)
+
+        tracks = ([state.now_playing] if state.now_playing else []) + state.queue
+        channel = guild.get_channel(state.voice_channel_id) if state.voice_channel_id else None
+        if channel is None or not (tracks or state.always_on):
+            return
+        async with limit:
+            try:
+                if guild.voice_client is None:
+                    await channel.connect()
+                    await guild.change_voice_state(channel=channel, self_deaf=True)
+            except Exception as e:
+                print(f"Error rejoining voice in {guild.name}: {e}")
+                return
+
+        text_channel = guild.get_channel(state.text_channel_id) if state.text_channel_id else None
+        if not tracks or text_channel is None:
+            return
+        ctx = ChannelContext(guild, text_channel)
+        player = self.get_player(ctx)
+        player.queue.clear()  # Logged, so the replayed log doesn't double up on the next restore
+        player.queue.put_many(tracks)
+        if state.now_playing:
+            player.start_at = (state.now_playing.id, state.position)
+        self.start_player(ctx, player)
+
+    def player_stats(self):
+        """Gauges for the lifecycle of players and their tasks"""
+        return {
+            "players": len(self.players),
+            "player_tasks": sum(1 for p in self.players.values() if p.player_task and not p.player_task.done()),
+            "prefetch_tasks": sum(len(p.prefetch_tasks) for p in self.players.values()),
+            "voice_clients": len(self.bot.voice_clients),
+            "always_on": len(self.always_on),
+        }
+
+    def guild_status(self, guild_id=None):
+        """MusicPlayer.status() for one guild (None if it has no player), or a list for all"""
+        if guild_id is not None:
+            player = self.players.get(guild_id)
+            return player.status() if player else None
+        return [player.status() for player in list(self.players.values())]
+
+    def register_metrics(self):
+        """Gauges read from the cog's live state when /metrics is scraped"""
+        REGISTRY.gauge("music_players", "Guild players in memory", func=lambda: len(self.players))
+        REGISTRY.gauge(
+            "music_queue_tracks", "Tracks waiting in all queues",
+            func=lambda: sum(len(player.queue) for player in list(self.players.values()))
+        )
+        REGISTRY.gauge(
+            "music_voice_clients", "Connected voice clients", func=lambda: len(self.bot.voice_clients)
+        )
+        REGISTRY.gauge(
+            "music_resolver_pending", "Resolver jobs queued or running", func=lambda: self.resolver.pending
+        )
+        REGISTRY.gauge(
+            "music_upstream_rate", "Extractions per second the adaptive limiter currently allows",
+            func=lambda: self.resolver.limiter.rate
+        )
+        REGISTRY.gauge(
+            "music_upstream_breaker_open", "1 while the YouTube circuit breaker is open, 0.5 half-open",
+            func=lambda: {"closed": 0, "half-open": 0.5, "open": 1}[self.resolver.breaker.state]
+        )
+        if self.nodes:
+            REGISTRY.gauge(
+                "music_audio_node_healthy", "Whether each audio node answers pings", ["node"],
+                func=lambda: {(node["name"],): int(node["healthy"]) for node in self.nodes.stats()}
+            )
+
+    def shard_stats(self):
+        """Guilds, players and voice clients per shard run by this process"""
+        shard_ids = list(self.bot.shards) if isinstance(self.bot, commands.AutoShardedBot) else [self.bot.shard_id or 0]
+        shards = {
+            sid: {"guilds": 0, "players": 0, "voice_clients": 0, "latency_ms": None}
+            for sid in shard_ids
+        }
+        for guild in self.bot.guilds:
+            if guild.shard_id in shards:
+                shards[guild.shard_id]["guilds"] += 1
+        for gid, player in self.players.items():
+            if player.guild.shard_id in shards:
+                shards[player.guild.shard_id]["players"] += 1
+        for vc in self.bot.voice_clients:
+            if vc.guild.shard_id in shards:
+                shards[vc.guild.shard_id]["voice_clients"] += 1
+        for sid, stats in shards.items():
+            shard = self.bot.get_shard(sid) if isinstance(self.bot, commands.AutoShardedBot) else None
+            latency = shard.latency if shard else self.bot.latency
+            if latency == latency and latency != float("inf"):  # NaN/inf until the first heartbeat
+                stats["latency_ms"] = latency * 1000
+        return shards
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
@@ -136,8 +786,8 @@ class MusicCog(commands.Cog):
         guild = member.guild
         voice_client = guild.voice_client
         
-        # If bot is not connected, check if we should auto-reconnect
-        if not voice_client and guild.id in self.last_channels:
+        # If bot is not connected, check if we should auto-reconnect (24/7 guilds only)
+        if not voice_client and guild.id in self.always_on and guild.id in self.last_channels:
             last_channel = self.last_channels[guild.id]
             # If user joins the last channel bot was in, auto-reconnect
             if after.channel and after.channel.id == last_channel:
@@ -160,14 +810,58 @@ class MusicCog(commands.Cog):
         
         # If bot gets disconnected, store the last channel
         elif voice_client and before.channel and not after.channel and member == guild.me:
-            self.last_channels[guild.id] = before.channel.id
+            self.remember_channel(guild.id, before.channel.id)
+
+    async def invoke(self, command, interaction, *args, via="slash", **kwargs):
+        """Run a prefix command's handler for a slash command or button press.
+
+        Every entry point shares the one handler; this one passes it an
+        Invocation instead of building a commands.Context. Button replies are
+        ephemeral. Slash commands are timed by main.py's completion hook;
+        buttons have none, so they are timed here, likewise from the
+        interaction's creation.
+        """
+        ctx = Invocation(interaction, via, ephemeral=via == "button")
+        try:
+            await command.callback(self, ctx, *args, **kwargs)
+        finally:
+            if via == "button":
+                elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+                COMMAND_SECONDS.observe(elapsed, command=command.name, via=via)
+
+    async def press(self, action, interaction):
+        """Run a panel button's action as the matching command"""
+        if action == "play_pause":
+            vc = interaction.guild.voice_client if interaction.guild else None
+            command = self.resume if vc and vc.is_paused() else self.pause
+            await self.invoke(command, interaction, via="button")
+        elif action in ("volume_down", "volume_up"):
+            player = self.players.get(interaction.guild_id)
+            step = 10 if action == "volume_up" else -10
+            percent = round(player.filters.volume * 100) + step if player else None
+            await self.invoke(self.volume, interaction, percent, via="button")
+        else:
+            # Bass and nightcore without a value toggle
+            commands_by_action = {
+                "skip": self.skip, "pause": self.pause, "resume": self.resume, "queue": self.queue_,
+                "bass": self.bass, "nightcore": self.nightcore, "stop": self.stop,
+            }
+            await self.invoke(commands_by_action[action], interaction, via="button")
+
+    def player_for(self, ctx):
+        """The guild's player if it has one; unlike get_player, never creates one"""
+        return self.players.get(ctx.guild.id) if ctx.guild else None
 
     def get_player(self, ctx):
         gid = ctx.guild.id
         if gid not in self.players:
-            self.players[gid] = MusicPlayer(self.bot, ctx.guild)
+            self.players[gid] = MusicPlayer(
+                self.bot, ctx.guild, self.resolver, self.ffmpeg, self.audio_cache, self.state, self.nodes,
+                self.control_panel
+            )
         player = self.players[gid]
         player.voice_client = ctx.voice_client
+        player.touch()
         return player
 
     async def join_voice(self, ctx):
@@ -186,7 +880,7 @@ class MusicCog(commands.Cog):
                 # Auto-deafen the bot when joining
                 await ctx.guild.change_voice_state(channel=channel, self_deaf=True)
                 # Store last channel for auto-reconnect
-                self.last_channels[ctx.guild.id] = channel.id
+                self.remember_channel(ctx.guild.id, channel.id)
             except Exception as e:
                 await ctx.send(f"Failed to join: {e}")
                 return None
@@ -196,7 +890,7 @@ class MusicCog(commands.Cog):
                 # Auto-deafen the bot when moving
                 await ctx.guild.change_voice_state(channel=channel, self_deaf=True)
                 # Store last channel for auto-reconnect
-                self.last_channels[ctx.guild.id] = channel.id
+                self.remember_channel(ctx.guild.id, channel.id)
             except Exception as e:
                 await ctx.send(f"Failed to move: {e}")
                 return None
@@ -209,7 +903,7 @@ class MusicCog(commands.Cog):
     @commands.command(name="play", aliases=["p"])
     async def play(self, ctx, *, query: str):
         """Play a song from YouTube by name or URL."""
-        if not is_ffmpeg_installed():
+        if not await self.ffmpeg_available():
             embed = discord.Embed(
                 title="❌ FFmpeg Error",
                 description="FFmpeg is not installed or not in PATH!\nPlease install FFmpeg and make sure it's accessible from your command line.",
@@ -219,53 +913,110 @@ class MusicCog(commands.Cog):
             await ctx.send(embed=embed)
             return
 
+        # Joining voice and looking the song up can outlast the interaction's 3 s
+        await ctx.defer()
         vc = await self.join_voice(ctx)
         if not vc:
             return
         player = self.get_player(ctx)
         player.voice_client = vc
+
+        url = playlist_url(query)
+        if url:
+            await self.enqueue_playlist(ctx, player, url)
+            return
+
         try:
-            info = get_youtube_audio(query)
+            info = await self.resolver.lookup(ctx.guild.id, query)
+        except ResolverCancelled:
+            return
         except Exception as e:
-            embed = discord.Embed(
-                title="❌ Error",
-                description=f"Could not get audio: {e}",
-                color=ORANGE_COLOR
-            )
+            await ctx.send(embed=resolver_error_embed(e))
+            return
+        try:
+            player.queue.put(info.with_requester(ctx.author.id))
+        except QueueFull as e:
+            embed = discord.Embed(title="❌ Error", description=str(e), color=ORANGE_COLOR)
             await ctx.send(embed=embed)
             return
-        await player.queue.put(info)
-        
+        if player.now_playing and player.queue.qsize() <= PREFETCH_COUNT:
+            player.prefetch()
+
+        await player.queue_notifier.added(ctx, info, player.queue.qsize())
+        self.start_player(ctx, player)
+
+    def start_player(self, ctx, player):
+        if self.state:
+            self.state.update_guild(ctx.guild.id, text_channel_id=ctx.channel.id)
+        if not player.player_task or player.player_task.done():
+            # Announcements go to the channel, outliving the command (or interaction) that started playback
+            loop_ctx = ChannelContext(ctx.guild, ctx.channel)
+            player.player_task = self.bot.loop.create_task(player.player_loop(loop_ctx))
+
+    async def enqueue_playlist(self, ctx, player, url):
+        """Queue a playlist page by page, editing one progress message as it goes"""
+        message = None
+        last_update = 0
+        added = 0
+        full = False
+        title = "Playlist"
+        try:
+            async for title, refs in self.resolver.iter_playlist(ctx.guild.id, url):
+                # Stopped or evicted while this page loaded or the progress message was sent.
+                # cancel_guild only reaches work in flight, so check the player itself.
+                if self.players.get(ctx.guild.id) is not player:
+                    return
+                count = player.queue.put_many(ref.with_requester(ctx.author.id) for ref in refs)
+                added += count
+                full = count < len(refs)
+                if count:
+                    self.start_player(ctx, player)
+                if full:
+                    break
+                if player.now_playing:
+                    player.prefetch()
+
+                embed = discord.Embed(
+                    title="📃 Loading Playlist",
+                    description=f"**{title}**\nQueued {added} tracks so far...",
+                    color=ORANGE_COLOR
+                )
+                if message is None:
+                    message = await ctx.send(embed=embed)
+                    last_update = time.monotonic()
+                elif time.monotonic() - last_update >= PLAYLIST_PROGRESS_INTERVAL:
+                    await message.edit(embed=embed)
+                    last_update = time.monotonic()
+        except ResolverCancelled:
+            return
+        except Exception as e:
+            if not added:
+                await ctx.send(embed=resolver_error_embed(e))
+                return
+
         embed = discord.Embed(
-            title="✅ Added to Queue",
-            description=f"**{info['title']}**",
+            title="✅ Playlist Added",
+            description=f"**{title}**\nAdded {added} tracks to the queue",
             color=ORANGE_COLOR
         )
-        embed.add_field(name="Position", value=f"{player.queue.qsize()}", inline=True)
-        await ctx.send(embed=embed)
-
-        if not player.player_task or player.player_task.done():
-            player.player_task = self.bot.loop.create_task(player.player_loop(ctx))
+        if full:
+            embed.description += f" (queue is full at {player.queue.maxlen})"
+        elif not added:
+            embed.description = f"**{title}**\nNo playable tracks found"
+        if message is None:
+            await ctx.send(embed=embed)
+        else:
+            await message.edit(embed=embed)
 
     @app_commands.command(name="play", description="Play a song from YouTube by name or URL.")
     @app_commands.describe(query="Song name or YouTube URL")
     async def slash_play(self, interaction: discord.Interaction, query: str):
-        if not is_ffmpeg_installed():
-            await interaction.response.send_message(
-                "❌ **FFmpeg is not installed or not in PATH!**\n"
-                "Please install FFmpeg and make sure it's accessible from your command line.\n"
-                "See: https://ffmpeg.org/download.html",
-                ephemeral=True
-            )
-            return
-        await interaction.response.defer()
-        ctx = await self.bot.get_context(interaction)
-        await self.play(ctx, query=query)
+        await self.invoke(self.play, interaction, query=query)
 
     @commands.command(name="pause")
     async def pause(self, ctx):
-        if ctx.voice_client and ctx.voice_client.is_playing():
-            ctx.voice_client.pause()
+        player = self.player_for(ctx)
+        if player and player.pause():
             embed = discord.Embed(
                 title="⏸️ Paused",
                 description="Music has been paused",
@@ -282,13 +1033,12 @@ class MusicCog(commands.Cog):
 
     @app_commands.command(name="pause", description="Pause the current song.")
     async def slash_pause(self, interaction: discord.Interaction):
-        ctx = await self.bot.get_context(interaction)
-        await self.pause(ctx)
+        await self.invoke(self.pause, interaction)
 
     @commands.command(name="resume")
     async def resume(self, ctx):
-        if ctx.voice_client and ctx.voice_client.is_paused():
-            ctx.voice_client.resume()
+        player = self.player_for(ctx)
+        if player and player.resume():
             embed = discord.Embed(
                 title="▶️ Resumed",
                 description="Music has been resumed",
@@ -305,14 +1055,14 @@ class MusicCog(commands.Cog):
 
     @app_commands.command(name="resume", description="Resume the current song.")
     async def slash_resume(self, interaction: discord.Interaction):
-        ctx = await self.bot.get_context(interaction)
-        await self.resume(ctx)
+        await self.invoke(self.resume, interaction)
 
     @commands.command(name="stop")
     async def stop(self, ctx):
         if ctx.voice_client:
-            player = self.get_player(ctx)
-            player.cleanup()
+            await ctx.defer()  # Disconnecting waits on the voice gateway
+            self.evict_player(ctx.guild.id)
+            self.set_always_on(ctx.guild.id, False)
             await ctx.voice_client.disconnect()
             embed = discord.Embed(
                 title="⏹️ Stopped",
@@ -330,13 +1080,12 @@ class MusicCog(commands.Cog):
 
     @app_commands.command(name="stop", description="Stop playback and leave voice.")
     async def slash_stop(self, interaction: discord.Interaction):
-        ctx = await self.bot.get_context(interaction)
-        await self.stop(ctx)
+        await self.invoke(self.stop, interaction)
 
     @commands.command(name="skip")
     async def skip(self, ctx):
-        if ctx.voice_client and ctx.voice_client.is_playing():
-            ctx.voice_client.stop()
+        player = self.player_for(ctx)
+        if player and player.skip():
             embed = discord.Embed(
                 title="⏭️ Skipped",
                 description="Skipped to the next song",
@@ -353,8 +1102,54 @@ class MusicCog(commands.Cog):
 
     @app_commands.command(name="skip", description="Skip to the next song.")
     async def slash_skip(self, interaction: discord.Interaction):
-        ctx = await self.bot.get_context(interaction)
-        await self.skip(ctx)
+        await self.invoke(self.skip, interaction)
+
+    @commands.command(name="seek")
+    async def seek(self, ctx, position: str):
+        """Jump to a position in the current song, e.g. 1:30, 90 or +30"""
+        player = self.get_player(ctx)
+        track = player.now_playing
+        if not track or not ctx.voice_client:
+            embed = discord.Embed(title="❌ Error", description="Nothing is playing.", color=ORANGE_COLOR)
+            await ctx.send(embed=embed)
+            return
+        try:
+            seconds = parse_time(position, player.position)
+        except ValueError:
+            embed = discord.Embed(
+                title="❌ Error",
+                description="Give a time like `1:30`, `90` or `+30`.",
+                color=ORANGE_COLOR
+            )
+            await ctx.send(embed=embed)
+            return
+        if track.duration and seconds >= track.duration:
+            embed = discord.Embed(
+                title="❌ Error",
+                description=f"**{track.title}** is only {format_time(track.duration)} long.",
+                color=ORANGE_COLOR
+            )
+            await ctx.send(embed=embed)
+            return
+        await ctx.defer()  # Opening the stream again can take a while
+        if await player.seek(ctx, seconds):
+            embed = discord.Embed(
+                title="⏩ Seeked",
+                description=f"**{track.title}** at {format_time(seconds)}",
+                color=ORANGE_COLOR
+            )
+        else:
+            embed = discord.Embed(
+                title="❌ Error",
+                description=f"Could not seek in **{track.title}**; it may have just ended.",
+                color=ORANGE_COLOR
+            )
+        await ctx.send(embed=embed)
+
+    @app_commands.command(name="seek", description="Jump to a position in the current song.")
+    @app_commands.describe(position="Time like 1:30, 90 or +30")
+    async def slash_seek(self, interaction: discord.Interaction, position: str):
+        await self.invoke(self.seek, interaction, position)
 
     @commands.command(name="queue")
     async def queue_(self, ctx):
@@ -367,7 +1162,7 @@ class MusicCog(commands.Cog):
         if player.now_playing:
             embed.add_field(
                 name="🎵 Now Playing",
-                value=f"**{player.now_playing['title']}**",
+                value=f"**{player.now_playing.title}**",
                 inline=False
             )
         else:
@@ -384,10 +1179,10 @@ class MusicCog(commands.Cog):
                 inline=False
             )
         else:
-            items = list(player.queue._queue)
-            queue_text = "\n".join([f"{i+1}. {item['title']}" for i, item in enumerate(items[:10])])
-            if len(items) > 10:
-                queue_text += f"\n... and {len(items) - 10} more"
+            items = player.queue.slice(0, 10)
+            queue_text = "\n".join([f"{i+1}. {item.title}" for i, item in enumerate(items)])
+            if len(player.queue) > 10:
+                queue_text += f"\n... and {len(player.queue) - 10} more"
             embed.add_field(
                 name="📋 Queue",
                 value=queue_text,
@@ -398,8 +1193,82 @@ class MusicCog(commands.Cog):
 
     @app_commands.command(name="queue", description="Show the current song queue.")
     async def slash_queue(self, interaction: discord.Interaction):
-        ctx = await self.bot.get_context(interaction)
-        await self.queue_(ctx)
+        await self.invoke(self.queue_, interaction)
+
+    @commands.command(name="shuffle")
+    async def shuffle(self, ctx):
+        player = self.get_player(ctx)
+        if player.queue.empty():
+            embed = discord.Embed(title="❌ Error", description="Queue is empty.", color=ORANGE_COLOR)
+            await ctx.send(embed=embed)
+            return
+        player.queue.shuffle()
+        embed = discord.Embed(
+            title="🔀 Shuffled",
+            description=f"Shuffled {len(player.queue)} tracks",
+            color=ORANGE_COLOR
+        )
+        await ctx.send(embed=embed)
+
+    @app_commands.command(name="shuffle", description="Shuffle the queue.")
+    async def slash_shuffle(self, interaction: discord.Interaction):
+        await self.invoke(self.shuffle, interaction)
+
+    @commands.command(name="remove")
+    async def remove(self, ctx, position: int):
+        player = self.get_player(ctx)
+        if not 1 <= position <= len(player.queue):
+            embed = discord.Embed(title="❌ Error", description="No track at that position.", color=ORANGE_COLOR)
+            await ctx.send(embed=embed)
+            return
+        track = player.queue.remove(position - 1)
+        embed = discord.Embed(
+            title="🗑️ Removed",
+            description=f"**{track.title}**",
+            color=ORANGE_COLOR
+        )
+        await ctx.send(embed=embed)
+
+    @app_commands.command(name="remove", description="Remove a track from the queue.")
+    @app_commands.describe(position="Queue position of the track")
+    async def slash_remove(self, interaction: discord.Interaction, position: int):
+        await self.invoke(self.remove, interaction, position)
+
+    @commands.command(name="move")
+    async def move(self, ctx, source: int, destination: int):
+        player = self.get_player(ctx)
+        size = len(player.queue)
+        if not (1 <= source <= size and 1 <= destination <= size):
+            embed = discord.Embed(title="❌ Error", description="No track at that position.", color=ORANGE_COLOR)
+            await ctx.send(embed=embed)
+            return
+        track = player.queue.move(source - 1, destination - 1)
+        embed = discord.Embed(
+            title="↕️ Moved",
+            description=f"**{track.title}** is now at position {destination}",
+            color=ORANGE_COLOR
+        )
+        await ctx.send(embed=embed)
+
+    @app_commands.command(name="move", description="Move a track to another queue position.")
+    @app_commands.describe(source="Current position", destination="New position")
+    async def slash_move(self, interaction: discord.Interaction, source: int, destination: int):
+        await self.invoke(self.move, interaction, source, destination)
+
+    @commands.command(name="dedupe")
+    async def dedupe(self, ctx):
+        player = self.get_player(ctx)
+        removed = player.queue.dedupe()
+        embed = discord.Embed(
+            title="🧹 Duplicates Removed",
+            description=f"Removed {removed} duplicate track(s)",
+            color=ORANGE_COLOR
+        )
+        await ctx.send(embed=embed)
+
+    @app_commands.command(name="dedupe", description="Remove duplicate tracks from the queue.")
+    async def slash_dedupe(self, interaction: discord.Interaction):
+        await self.invoke(self.dedupe, interaction)
 
     @commands.command(name="nowplaying", aliases=["np"])
     async def nowplaying(self, ctx):
@@ -407,11 +1276,15 @@ class MusicCog(commands.Cog):
         if player.now_playing:
             embed = discord.Embed(
                 title="🎵 Now Playing",
-                description=f"**{player.now_playing['title']}**",
+                description=f"**{player.now_playing.title}**",
                 color=ORANGE_COLOR,
-                url=player.now_playing['webpage_url']
+                url=player.now_playing.webpage_url
             )
-            embed.add_field(name="🔗 Link", value=f"[Click here]({player.now_playing['webpage_url']})", inline=True)
+            embed.add_field(name="🔗 Link", value=f"[Click here]({player.now_playing.webpage_url})", inline=True)
+            position = format_time(player.position)
+            if player.now_playing.duration:
+                position += f" / {format_time(player.now_playing.duration)}"
+            embed.add_field(name="⏱️ Position", value=position, inline=True)
             await ctx.send(embed=embed)
         else:
             embed = discord.Embed(
@@ -423,16 +1296,17 @@ class MusicCog(commands.Cog):
 
     @app_commands.command(name="nowplaying", description="Show the currently playing song.")
     async def slash_nowplaying(self, interaction: discord.Interaction):
-        ctx = await self.bot.get_context(interaction)
-        await self.nowplaying(ctx)
+        await self.invoke(self.nowplaying, interaction)
 
     @commands.command(name="247")
     async def two_four_seven(self, ctx):
         """Make bot stay in voice channel for 24/7 presence"""
+        await ctx.defer()
         vc = await self.join_voice(ctx)
         if vc:
             # Store the channel for persistence
-            self.last_channels[ctx.guild.id] = vc.channel.id
+            self.remember_channel(ctx.guild.id, vc.channel.id)
+            self.set_always_on(ctx.guild.id, True)
             embed = discord.Embed(
                 title="🔒 24/7 Mode Enabled",
                 description=f"Bot will stay in **{vc.channel.name}** and auto-reconnect when users join",
@@ -447,8 +1321,220 @@ class MusicCog(commands.Cog):
 
     @app_commands.command(name="247", description="Make bot stay in voice channel for 24/7 presence")
     async def slash_two_four_seven(self, interaction: discord.Interaction):
-        ctx = await self.bot.get_context(interaction)
-        await self.two_four_seven(ctx)
+        await self.invoke(self.two_four_seven, interaction)
+
+    async def send_filters(self, ctx, player, title):
+        if player.needs_decoding():
+            await ctx.defer()  # Reopening the stream can take a while
+        await player.apply_filters(ctx)
+        embed = discord.Embed(title=title, description=player.filters.describe(), color=ORANGE_COLOR)
+        if player.needs_decoding():
+            embed.set_footer(text="Could not apply to this track; it will apply from the next one")
+        await ctx.send(embed=embed)
+
+    @commands.command(name="volume", aliases=["vol"])
+    async def volume(self, ctx, percent: int = None):
+        player = self.get_player(ctx)
+        if percent is not None:
+            player.filters.set_volume(percent)
+        await self.send_filters(ctx, player, "🔊 Volume")
+
+    @app_commands.command(name="volume", description="Set the playback volume.")
+    @app_commands.describe(percent=f"0-{int(VOLUME_MAX * 100)}, 100 is normal")
+    async def slash_volume(self, interaction: discord.Interaction, percent: int):
+        await self.invoke(self.volume, interaction, percent)
+
+    @commands.command(name="bass")
+    async def bass(self, ctx, db: int = None):
+        """Boost the low end by db decibels; without a value, toggles a 6 dB boost"""
+        player = self.get_player(ctx)
+        if db is None:
+            db = 0 if player.filters.bass_db else 6
+        player.filters.set_bass(db)
+        await self.send_filters(ctx, player, "🎸 Bass Boost")
+
+    @app_commands.command(name="bass", description="Boost the bass.")
+    @app_commands.describe(db=f"Boost in dB (0-{BASS_MAX_DB}, 0 turns it off)")
+    async def slash_bass(self, interaction: discord.Interaction, db: int):
+        await self.invoke(self.bass, interaction, db)
+
+    @commands.command(name="nightcore")
+    async def nightcore(self, ctx):
+        player = self.get_player(ctx)
+        player.filters.rate = 1.0 if player.filters.rate != 1.0 else NIGHTCORE_RATE
+        await self.send_filters(ctx, player, "🌙 Nightcore")
+
+    @app_commands.command(name="nightcore", description="Toggle nightcore (faster, higher pitch).")
+    async def slash_nightcore(self, interaction: discord.Interaction):
+        await self.invoke(self.nightcore, interaction)
+
+    @commands.command(name="normalize")
+    async def normalize(self, ctx):
+        player = self.get_player(ctx)
+        player.filters.normalize = not player.filters.normalize
+        await self.send_filters(ctx, player, "📏 Normalize")
+
+    @app_commands.command(name="normalize", description="Toggle loudness normalisation.")
+    async def slash_normalize(self, interaction: discord.Interaction):
+        await self.invoke(self.normalize, interaction)
+
+    @commands.command(name="filters")
+    async def filters(self, ctx, action: str = None):
+        """Show the audio filters, or clear them with r!filters reset"""
+        player = self.get_player(ctx)
+        if action == "reset":
+            player.filters.reset()
+        await self.send_filters(ctx, player, "🎛️ Audio Filters")
+
+    @app_commands.command(name="filters", description="Show or reset the audio filters.")
+    @app_commands.describe(reset="Turn every filter off")
+    async def slash_filters(self, interaction: discord.Interaction, reset: bool = False):
+        await self.invoke(self.filters, interaction, "reset" if reset else None)
+
+    @commands.command(name="cache")
+    async def cache_stats(self, ctx):
+        """Show resolver cache hit/miss counters"""
+        stats = self.resolver.stats()
+        embed = discord.Embed(
+            title="🗃️ Resolver Cache",
+            description=(
+                f"Workers: {stats['workers']} ({stats['mode']}) | Pending: {stats['pending']}\n"
+                f"Extractions: {stats['extractions']} | Shared: {stats['deduplicated']}"
+            ),
+            color=ORANGE_COLOR
+        )
+        for name, level in stats["cache"].items():
+            embed.add_field(
+                name=name.title(),
+                value=(
+                    f"Size: {level['size']}/{level['maxsize']}\n"
+                    f"Hits: {level['hits']} | Misses: {level['misses']}\n"
+                    f"Hit rate: {level['hit_rate']:.0%}\n"
+                    f"Evicted: {level['evictions']} | Expired: {level['expirations']}"
+                ),
+                inline=True
+            )
+        if self.audio_cache:
+            disk = self.audio_cache.stats()
+            embed.add_field(
+                name="Disk",
+                value=(
+                    f"Files: {disk['files']} | {disk['size_bytes'] / 2**20:.0f}/{disk['max_bytes'] / 2**20:.0f} MB\n"
+                    f"Hits: {disk['hits']} | Misses: {disk['misses']}\n"
+                    f"Hit rate: {disk['hit_rate']:.0%}\n"
+                    f"Saved: {disk['bytes_saved'] / 2**20:.0f} MB | Evicted: {disk['evictions']}"
+                ),
+                inline=True
+            )
+        upstream = stats["upstream"]
+        breaker = upstream["breaker"]
+        state = breaker["state"].title()
+        if breaker["state"] == "open":
+            state += f" (retry in {breaker['retry_after']:.0f}s)"
+        embed.add_field(
+            name="YouTube",
+            value=(
+                f"Breaker: {state}\n"
+                f"Rate: {upstream['rate']:.1f}/{upstream['max_rate']:.1f} per s | Client: {upstream['client']}\n"
+                f"Throttled: {upstream['throttled']} | Retries: {upstream['retries']}"
+            ),
+            inline=False
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(name="shards")
+    async def shards(self, ctx):
+        """Show per-shard guilds, voice clients and latency for this process"""
+        lag = self.loop_lag.stats()
+        embed = discord.Embed(
+            title="🧩 Shards",
+            description=(
+                f"Shard count: **{self.bot.shard_count or 1}**\n"
+                f"Event loop lag: **{lag['avg_lag_ms']:.1f} ms** (max {lag['max_lag_ms']:.1f} ms)"
+            ),
+            color=ORANGE_COLOR
+        )
+        for sid, stats in list(self.shard_stats().items())[:25]:
+            latency = f"{stats['latency_ms']:.0f} ms" if stats["latency_ms"] is not None else "n/a"
+            embed.add_field(
+                name=f"Shard {sid}",
+                value=(
+                    f"{stats['guilds']} guilds\n"
+                    f"{stats['voice_clients']} voice / {stats['players']} players\n"
+                    f"Gateway {latency}"
+                ),
+                inline=True
+            )
+        await ctx.send(embed=embed)
+
+    @commands.command(name="nodes")
+    async def nodes_info(self, ctx):
+        """Show the audio worker nodes and their load"""
+        if not self.nodes:
+            embed = discord.Embed(
+                title="🖥️ Audio Nodes",
+                description="Audio is handled in the bot process (set `AUDIO_NODES` to use workers).",
+                color=ORANGE_COLOR
+            )
+            await ctx.send(embed=embed)
+            return
+        embed = discord.Embed(
+            title="🖥️ Audio Nodes",
+            description=f"{len(self.nodes.healthy_nodes())}/{len(self.nodes.nodes)} healthy, {self.nodes.restarts} restart(s)",
+            color=ORANGE_COLOR
+        )
+        for node in self.nodes.stats()[:25]:
+            latency = f"{node['latency_ms']:.1f} ms" if node["latency_ms"] is not None else "n/a"
+            embed.add_field(
+                name=f"{'🟢' if node['healthy'] else '🔴'} {node['name']}",
+                value=f"{node['guilds']} guilds\nCPU {node['cpu']:.0f}%\nPing {latency}",
+                inline=True
+            )
+        await ctx.send(embed=embed)
+
+    @commands.command(name="status")
+    async def status(self, ctx):
+        """Show live player and task gauges"""
+        stats = self.player_stats()
+        embed = discord.Embed(title="📊 Player Status", color=ORANGE_COLOR)
+        embed.add_field(name="Players", value=str(stats["players"]), inline=True)
+        embed.add_field(name="Player tasks", value=str(stats["player_tasks"]), inline=True)
+        embed.add_field(name="Prefetch tasks", value=str(stats["prefetch_tasks"]), inline=True)
+        embed.add_field(name="Voice clients", value=str(stats["voice_clients"]), inline=True)
+        embed.add_field(name="24/7 guilds", value=str(stats["always_on"]), inline=True)
+        if self.state:
+            state = self.state.stats()
+            embed.add_field(
+                name="State store",
+                value=(
+                    f"{state['pending_ops']} pending changes\n"
+                    f"Last flush {state['last_flush_ms']:.1f} ms\n"
+                    f"Last snapshot {state['last_snapshot_ms']:.1f} ms"
+                ),
+                inline=True
+            )
+        await ctx.send(embed=embed)
+
+    @commands.command(name="ffmpeg")
+    async def ffmpeg_info(self, ctx):
+        """Re-probe FFmpeg and show what it supports"""
+        caps = await self.ffmpeg.refresh()
+        if not caps.available:
+            embed = discord.Embed(
+                title="❌ FFmpeg Error",
+                description="FFmpeg is not installed or not in PATH!",
+                color=ORANGE_COLOR
+            )
+            await ctx.send(embed=embed)
+            return
+        embed = discord.Embed(
+            title="🛠️ FFmpeg",
+            description=f"`{caps.path}` (version {caps.version})",
+            color=ORANGE_COLOR
+        )
+        embed.add_field(name="Opus passthrough", value="✅" if caps.opus_passthrough else "❌ (transcoding)", inline=True)
+        embed.add_field(name="Reconnect", value="✅" if caps.reconnect else "❌", inline=True)
+        await ctx.send(embed=embed)
 
     @commands.command(name="panel")
     async def panel(self, ctx):
@@ -457,181 +1543,59 @@ class MusicCog(commands.Cog):
             description="Use the buttons below to control music playback",
             color=ORANGE_COLOR
         )
-        view = MusicPanel(self)
-        await ctx.send(embed=embed, view=view)
+        await ctx.send(embed=embed, view=self.music_panel)
 
-class MusicPanel(ui.View):
-    def __init__(self, cog):
-        super().__init__(timeout=None)
-        self.cog = cog
+# (label, style, row) of each panel button, by panel and action
+PANEL_BUTTONS = {
+    "control": {
+        "skip": ("⏭️ Skip", discord.ButtonStyle.secondary, 0),
+        "pause": ("⏸️ Pause", discord.ButtonStyle.primary, 0),
+        "resume": ("▶️ Resume", discord.ButtonStyle.success, 0),
+        "queue": ("📋 Queue", discord.ButtonStyle.secondary, 0),
+        "stop": ("⏹️ Stop", discord.ButtonStyle.danger, 0),
+        "volume_down": ("🔉 Vol -", discord.ButtonStyle.secondary, 1),
+        "volume_up": ("🔊 Vol +", discord.ButtonStyle.secondary, 1),
+        "bass": ("🎸 Bass", discord.ButtonStyle.secondary, 1),
+        "nightcore": ("🌙 Nightcore", discord.ButtonStyle.secondary, 1),
+    },
+    "panel": {
+        "play_pause": ("Play/Pause", discord.ButtonStyle.primary, 0),
+        "skip": ("Skip", discord.ButtonStyle.secondary, 0),
+        "stop": ("Stop", discord.ButtonStyle.danger, 0),
+    },
+}
 
-    @ui.button(label="Play/Pause", style=discord.ButtonStyle.primary)
-    async def play_pause(self, interaction: discord.Interaction, button: ui.Button):
-        ctx = await self.cog.bot.get_context(interaction)
-        vc = ctx.voice_client
-        if vc:
-            if vc.is_playing():
-                vc.pause()
-                embed = discord.Embed(title="⏸️ Paused", description="Music has been paused", color=ORANGE_COLOR)
-                await interaction.response.send_message(embed=embed, ephemeral=True)
-            elif vc.is_paused():
-                vc.resume()
-                embed = discord.Embed(title="▶️ Resumed", description="Music has been resumed", color=ORANGE_COLOR)
-                await interaction.response.send_message(embed=embed, ephemeral=True)
-            else:
-                embed = discord.Embed(title="❌ Error", description="Nothing is playing.", color=ORANGE_COLOR)
-                await interaction.response.send_message(embed=embed, ephemeral=True)
-        else:
-            embed = discord.Embed(title="❌ Error", description="Not connected.", color=ORANGE_COLOR)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-
-    @ui.button(label="Skip", style=discord.ButtonStyle.secondary)
-    async def skip(self, interaction: discord.Interaction, button: ui.Button):
-        ctx = await self.cog.bot.get_context(interaction)
-        if ctx.voice_client and ctx.voice_client.is_playing():
-            ctx.voice_client.stop()
-            embed = discord.Embed(title="⏭️ Skipped", description="Skipped to the next song", color=ORANGE_COLOR)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-        else:
-            embed = discord.Embed(title="❌ Error", description="Nothing is playing.", color=ORANGE_COLOR)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+class PanelButton(ui.DynamicItem[ui.Button], template=r"music:(?P<panel>control|panel):(?P<action>[a-z_]+)"):
+    """A control panel button, acting on the guild it was pressed in.
 
-    @ui.button(label="Stop", style=discord.ButtonStyle.danger)
-    async def stop(self, interaction: discord.Interaction, button: ui.Button):
-        ctx = await self.cog.bot.get_context(interaction)
-        if ctx.voice_client:
-            ctx.voice_client.stop()
-            await ctx.voice_client.disconnect()
-            embed = discord.Embed(title="⏹️ Stopped", description="Music stopped and disconnected", color=ORANGE_COLOR)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            player = self.cog.get_player(ctx)
-            player.cleanup()
-        else:
-            embed = discord.Embed(title="❌ Error", description="Not connected.", color=ORANGE_COLOR)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+    The action is in the custom_id, so the class is registered once with
+    bot.add_dynamic_items and handles every panel message, including those
+    sent before a restart, without a view stored per message.
+    """
 
-class MusicControlPanel(ui.View):
-    def __init__(self, bot):
-        super().__init__(timeout=300)  # 5 minute timeout
-        self.bot = bot
+    def __init__(self, panel, action):
+        label, style, row = PANEL_BUTTONS[panel][action]
+        super().__init__(ui.Button(label=label, style=style, custom_id=f"music:{panel}:{action}"), row=row)
+        self.action = action
 
-    @ui.button(label="⏭️ Skip", style=discord.ButtonStyle.secondary)
-    async def skip(self, interaction: discord.Interaction, button: ui.Button):
-        # Respond immediately to avoid timeout
-        await interaction.response.defer(ephemeral=True)
-        
-        guild = interaction.guild
-        if guild and guild.voice_client and guild.voice_client.is_playing():
-            guild.voice_client.stop()
-            embed = discord.Embed(title="⏭️ Skipped", description="Skipped to the next song", color=ORANGE_COLOR)
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        else:
-            embed = discord.Embed(title="❌ Error", description="Nothing is playing.", color=ORANGE_COLOR)
-            await interaction.followup.send(embed=embed, ephemeral=True)
-
-    @ui.button(label="⏸️ Pause", style=discord.ButtonStyle.primary)
-    async def pause(self, interaction: discord.Interaction, button: ui.Button):
-        # Respond immediately to avoid timeout
-        await interaction.response.defer(ephemeral=True)
-        
-        guild = interaction.guild
-        if guild and guild.voice_client and guild.voice_client.is_playing():
-            guild.voice_client.pause()
-            embed = discord.Embed(title="⏸️ Paused", description="Music has been paused", color=ORANGE_COLOR)
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        else:
-            embed = discord.Embed(title="❌ Error", description="Nothing is playing.", color=ORANGE_COLOR)
-            await interaction.followup.send(embed=embed, ephemeral=True)
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        panel, action = match["panel"], match["action"]
+        if action not in PANEL_BUTTONS[panel]:
+            raise ValueError(f"Unknown panel button {action}")
+        return cls(panel, action)
 
-    @ui.button(label="▶️ Resume", style=discord.ButtonStyle.success)
-    async def resume(self, interaction: discord.Interaction, button: ui.Button):
-        # Respond immediately to avoid timeout
-        await interaction.response.defer(ephemeral=True)
-        
-        guild = interaction.guild
-        if guild and guild.voice_client and guild.voice_client.is_paused():
-            guild.voice_client.resume()
-            embed = discord.Embed(title="▶️ Resumed", description="Music has been resumed", color=ORANGE_COLOR)
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        else:
-            embed = discord.Embed(title="❌ Error", description="Nothing is paused.", color=ORANGE_COLOR)
-            await interaction.followup.send(embed=embed, ephemeral=True)
-
-    @ui.button(label="📋 Queue", style=discord.ButtonStyle.secondary)
-    async def show_queue(self, interaction: discord.Interaction, button: ui.Button):
-        # Respond immediately to avoid timeout
-        await interaction.response.defer(ephemeral=True)
-        
-        cog = self.bot.get_cog('MusicCog')
+    async def callback(self, interaction):
+        cog = interaction.client.get_cog("MusicCog")
         if cog:
-            # Create a simple context object
-            class SimpleContext:
-                def __init__(self, guild, voice_client):
-                    self.guild = guild
-                    self.voice_client = voice_client
-            
-            ctx = SimpleContext(interaction.guild, interaction.guild.voice_client)
-            player = cog.get_player(ctx)
-            embed = discord.Embed(title="🎵 Music Queue", color=ORANGE_COLOR)
-            
-            if player.now_playing:
-                embed.add_field(
-                    name="🎵 Now Playing",
-                    value=f"**{player.now_playing['title']}**",
-                    inline=False
-                )
-            else:
-                embed.add_field(
-                    name="🎵 Now Playing",
-                    value="Nothing playing",
-                    inline=False
-                )
-                
-            if player.queue.empty():
-                embed.add_field(
-                    name="📋 Queue",
-                    value="Queue is empty",
-                    inline=False
-                )
-            else:
-                items = list(player.queue._queue)
-                queue_text = "\n".join([f"{i+1}. {item['title']}" for i, item in enumerate(items[:5])])
-                if len(items) > 5:
-                    queue_text += f"\n... and {len(items) - 5} more"
-                embed.add_field(
-                    name="📋 Queue",
-                    value=queue_text,
-                    inline=False
-                )
-            
-            await interaction.followup.send(embed=embed, ephemeral=True)
+            await cog.press(self.action, interaction)
 
-    @ui.button(label="⏹️ Stop", style=discord.ButtonStyle.danger)
-    async def stop(self, interaction: discord.Interaction, button: ui.Button):
-        # Respond immediately to avoid timeout
-        await interaction.response.defer(ephemeral=True)
-        
-        guild = interaction.guild
-        if guild and guild.voice_client:
-            guild.voice_client.stop()
-            await guild.voice_client.disconnect()
-            embed = discord.Embed(title="⏹️ Stopped", description="Music stopped and disconnected", color=ORANGE_COLOR)
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            
-            cog = self.bot.get_cog('MusicCog')
-            if cog:
-                # Create a simple context object
-                class SimpleContext:
-                    def __init__(self, guild, voice_client):
-                        self.guild = guild
-                        self.voice_client = voice_client
-                
-                ctx = SimpleContext(guild, None)
-                player = cog.get_player(ctx)
-                player.cleanup()
-        else:
-            embed = discord.Embed(title="❌ Error", description="Not connected.", color=ORANGE_COLOR)
-            await interaction.followup.send(embed=embed, ephemeral=True)
+def panel_view(panel):
+    """View with the given panel's buttons; only dynamic items, so sending it registers nothing"""
+    view = ui.View(timeout=None)
+    for action in PANEL_BUTTONS[panel]:
+        view.add_item(PanelButton(panel, action))
+    return view
 
 async def setup(bot):
     await bot.add_cog(MusicCog(bot))
\ No newline at end of file
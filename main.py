@@ -1,6 +1,5 @@
 import os
-import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import time
 
 # FFmpeg is now installed via Nix in replit.nix
 
@@ -8,6 +7,9 @@ import discord
 from discord.ext import commands
 import asyncio
 
+from utils.health import HealthServer
+from utils.metrics import COMMAND_ERRORS, COMMAND_SECONDS
+
 # Get Discord token from environment variables (Secrets)
 TOKEN = os.getenv("DISCORD_TOKEN")
 
@@ -20,35 +22,71 @@ if not TOKEN:
 STATUS_TYPE = os.getenv("STATUS_TYPE", "playing").lower()  # playing, watching, listening, streaming
 STATUS_MSG = os.getenv("STATUS_MSG", "🎵 Music | r!play")
 
+# Sharding: SHARDED=1 lets discord.py pick the shard count and run every shard in
+# this process; SHARD_COUNT plus SHARD_IDS (e.g. "0,1") runs just those shards,
+# so several processes can split the shards between them.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 0)) or None
+SHARD_IDS = [int(i) for i in os.getenv("SHARD_IDS", "").split(",") if i.strip()] or None
+SHARDED = os.getenv("SHARDED", "").lower() in ("1", "true", "yes") or bool(SHARD_COUNT or SHARD_IDS)
+
+if SHARD_IDS and not SHARD_COUNT:
+    print("❌ Error: SHARD_IDS needs SHARD_COUNT (the total number of shards across all processes)")
+    exit(1)
+
 intents = discord.Intents.default()
 intents.message_content = True  # Enable hearing messages content for prefix commands
 intents.voice_states = True  # Required for music features
 
-bot = commands.Bot(
-    command_prefix="r!",
-    intents=intents,
-    help_command=None,  # Remove default help command
-)
-
-# Simple HTTP server for hosting platforms that require port binding
-class SimpleHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.end_headers()
-        self.wfile.write(b'Discord Bot is running!')
-    
-    def log_message(self, format, *args):
-        pass  # Suppress HTTP server logs
+if SHARDED:
+    bot = commands.AutoShardedBot(
+        command_prefix="r!",
+        intents=intents,
+        help_command=None,  # Remove default help command
+        shard_count=SHARD_COUNT,
+        shard_ids=SHARD_IDS,
+    )
+else:
+    bot = commands.Bot(
+        command_prefix="r!",
+        intents=intents,
+        help_command=None,  # Remove default help command
+    )
+
+EXTENSIONS = ["cogs.music", "cogs.othercmd", "cogs.help"]
+
+# Health probes, guild status and metrics over HTTP, served on the bot's own loop
+health = HealthServer(bot, EXTENSIONS)
+
+# Voice reconnects after a restart run in the background; the reference keeps the task alive
+restore_task = None
 
-def start_http_server():
-    port = int(os.getenv('PORT', 8080))  # Use PORT env var or default to 8080
-    server = HTTPServer(('0.0.0.0', port), SimpleHandler)
-    server.serve_forever()
+def restore_done(task):
+    if not task.cancelled() and task.exception():
+        print(f"Error restoring saved state: {task.exception()}")
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+
+@bot.after_invoke
+async def record_command_time(ctx):
+    # Runs even when the command raised
+    name = ctx.command.qualified_name
+    COMMAND_SECONDS.observe(time.perf_counter() - ctx.started_at, command=name, via="prefix")
+    if ctx.command_failed:
+        COMMAND_ERRORS.inc(command=name)
+
+@bot.event
+async def on_app_command_completion(interaction, command):
+    # Slash commands have no invoke hooks; time them from the interaction's creation
+    elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    COMMAND_SECONDS.observe(elapsed, command=command.qualified_name, via="slash")
 
 @bot.event
 async def on_ready():
     print(f"Logged in as {bot.user} (ID: {bot.user.id})")
+    if SHARDED:
+        print(f"Running shards {sorted(bot.shards)} of {bot.shard_count} ({len(bot.guilds)} guilds)")
     print("------")
     
     # Set bot status
@@ -69,23 +107,34 @@ async def on_ready():
     except Exception as e:
         print(f"Error setting status: {e}")
     
+    # Rejoin voice channels and queues saved before the last shutdown (no-op without STATE_DB),
+    # without holding up the command sync and readiness on slow voice connects
+    global restore_task
+    music = bot.get_cog("MusicCog")
+    if music and restore_task is None:
+        restore_task = asyncio.create_task(music.restore_state())
+        restore_task.add_done_callback(restore_done)
+
+    # Commands are global, so with several shard processes only the one running shard 0 syncs
+    if SHARD_IDS and 0 not in SHARD_IDS:
+        health.commands_synced = True
+        return
     try:
         synced = await bot.tree.sync()
+        health.commands_synced = True
         print(f"Synced {len(synced)} slash command(s).")
     except Exception as e:
         print(f"Error syncing commands: {e}")
 
 async def main():
-    # Start HTTP server in background thread (required by some hosting platforms)
-    http_thread = threading.Thread(target=start_http_server, daemon=True)
-    http_thread.start()
-    
-    # Load cogs
-    await bot.load_extension("cogs.music")
-    await bot.load_extension("cogs.othercmd")
-    await bot.load_extension("cogs.help")
-    # Start the bot
-    await bot.start(TOKEN)
+    # Bind the port first, hosting platforms wait for it before routing traffic
+    await health.start()
+    try:
+        for extension in EXTENSIONS:
+            await bot.load_extension(extension)
+        await bot.start(TOKEN)
+    finally:
+        await health.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
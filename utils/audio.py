@@ -0,0 +1,82 @@
+import os
+
+import discord
+
+AUDIO_MODE = os.getenv("AUDIO_MODE", "auto").lower()  # auto, opus (always copy) or pcm (always transcode)
+FRAME_SECONDS = 0.02  # One PCM frame, and one Opus packet in YouTube's streams
+
+def is_remote(track):
+    """False for tracks played from a local file (the disk cache)"""
+    return track.url.startswith(("http://", "https://"))
+
+def is_opus_48k(codec, sample_rate):
+    return codec == "opus" and sample_rate in (None, 48000)
+
+class TrackedSource(discord.AudioSource):
+    """Counts the frames read from a source to know the playback position"""
+
+    def __init__(self, source, start=0):
+        self.source = source
+        self.start = start  # Seconds into the track the source was opened at
+        self.frames = 0
+        self.ended = False  # The source ran out, rather than being stopped
+        self.on_first_frame = None  # Called once, from the thread reading the source
+
+    @property
+    def position(self):
+        return self.start + self.frames * FRAME_SECONDS
+
+    def is_opus(self):
+        return self.source.is_opus()
+
+    @property
+    def passthrough(self):
+        """True if the packets are the input's own Opus, so no filters are applied"""
+        return getattr(self.source, "passthrough", self.source.is_opus())
+
+    def read(self):
+        data = self.source.read()
+        if data:
+            self.frames += 1
+            if self.frames == 1 and self.on_first_frame:
+                self.on_first_frame()
+        else:
+            self.ended = True
+        return data
+
+    def cleanup(self):
+        self.source.cleanup()
+
+async def create_source(track, executable, before_options, options="-vn", mode=AUDIO_MODE, start=0):
+    """Build the FFmpeg source for a resolved track, starting start seconds in.
+
+    Opus at 48 kHz (YouTube's webm formats) is remuxed straight into Opus
+    packets so neither FFmpeg nor discord.py has to decode and re-encode
+    it. Anything else is decoded to PCM and encoded by discord.py.
+    """
+    if start:
+        # Input seeking: FFmpeg jumps (via an HTTP range request) instead of decoding up to start
+        before_options = f"-ss {start:.2f} {before_options}".strip()
+    codec, sample_rate = track.acodec, track.asr
+    if mode == "auto" and codec in (None, "none"):
+        # yt-dlp didn't report the codec (generic URLs), ask ffprobe instead
+        try:
+            codec, _ = await discord.FFmpegOpusAudio.probe(track.url)
+        except Exception:
+            codec = None  # Unknown, transcode to be safe
+        sample_rate = None
+
+    if mode == "opus" or (mode == "auto" and is_opus_48k(codec, sample_rate)):
+        return discord.FFmpegOpusAudio(
+            track.url,
+            codec="copy",
+            executable=executable,
+            before_options=before_options,
+            options=options,
+        )
+    return discord.FFmpegPCMAudio(
+        track.url,
+        executable=executable,
+        before_options=before_options,
+        options=options,
+    )
@@ -0,0 +1,220 @@
+"""Audio worker node.
+
+Opens FFmpeg, applies the DSP filters and Opus-encodes tracks for the bot
+process, which only forwards the finished packets to Discord. Started by
+NodePool as a subprocess and spoken to over a localhost socket using the
+length-prefixed protocol in utils.node_protocol:
+
+    python -m utils.audio_node --port 0
+
+Prints "LISTENING <port>" once it accepts connections.
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import discord
+
+from utils.audio import create_source
+from utils.dsp import AudioFilters, FilteredSource
+from utils.node_protocol import JSON, pack_audio, pack_json, read_message
+from utils.track import Track
+
+def apply_filters(filters, settings):
+    for name in ("volume", "normalize", "bass_db", "rate"):
+        if name in settings:
+            setattr(filters, name, settings[name])
+
+class Session:
+    """One guild's playback on this node: a thread that reads, filters and encodes frames.
+
+    The bot grants credit as its voice thread consumes packets, so a node
+    never runs more than a couple of seconds ahead of playback.
+    """
+
+    def __init__(self, node, guild_id, session_id, source, filters, credit):
+        self.node = node
+        self.guild_id = guild_id
+        self.session_id = session_id
+        self.source = source
+        self.filters = filters
+        self.credit = credit
+        self.closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"session-{guild_id}", daemon=True)
+        self._thread.start()
+
+    def grant(self, frames):
+        with self._cond:
+            self.credit += frames
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def _run(self):
+        encoder = None if self.source.is_opus() else discord.opus.Encoder()
+        reason, error = "finished", None
+        try:
+            while True:
+                with self._cond:
+                    while self.credit <= 0 and not self.closed:
+                        self._cond.wait()
+                    if self.closed:
+                        reason = "stopped"
+                        return
+                    self.credit -= 1
+                data = self.source.read()
+                if not data:
+                    return
+                if encoder:
+                    data = encoder.encode(data, encoder.SAMPLES_PER_FRAME)
+                self.node.send_audio(self.guild_id, self.session_id, data)
+                self.node.frames += 1
+        except Exception as e:
+            reason, error = "error", str(e)
+        finally:
+            self.source.cleanup()
+            self.node.session_ended(self, reason, error)
+
+class AudioNode:
+    def __init__(self):
+        self.sessions = {}  # guild_id -> Session
+        self.latest = {}  # guild_id -> newest session id asked for
+        self.writer = None
+        self.loop = None
+        self.frames = 0
+        self.closed = None  # Future set when the bot disconnects, for --once
+        self._cpu = (time.monotonic(), time.process_time())
+
+    def send(self, message):
+        if self.writer and not self.writer.is_closing():
+            self.writer.write(pack_json(message))
+
+    def send_audio(self, guild_id, session_id, packet):
+        """Called from session threads"""
+        self.loop.call_soon_threadsafe(self._write, pack_audio(guild_id, session_id, packet))
+
+    def _write(self, data):
+        if self.writer and not self.writer.is_closing():
+            self.writer.write(data)
+
+    def session_ended(self, session, reason, error):
+        """Called from session threads"""
+        def ended():
+            if self.sessions.get(session.guild_id) is session:
+                del self.sessions[session.guild_id]
+                self.latest.pop(session.guild_id, None)
+            if reason != "stopped":
+                self.send({"op": "end", "guild": session.guild_id, "session": session.session_id,
+                           "reason": reason, "error": error})
+        self.loop.call_soon_threadsafe(ended)
+
+    def cpu_percent(self):
+        """CPU used by this process (one core = 100) since the last call"""
+        wall, cpu = time.monotonic(), time.process_time()
+        last_wall, last_cpu = self._cpu
+        self._cpu = (wall, cpu)
+        return (cpu - last_cpu) / max(wall - last_wall, 1e-6) * 100
+
+    async def play(self, message):
+        guild_id = message["guild"]
+        self.latest[guild_id] = message["session"]
+        old = self.sessions.pop(guild_id, None)
+        if old:
+            old.close()
+        filters = AudioFilters()
+        apply_filters(filters, message.get("filters", {}))
+        track = Track(message.get("id"), message.get("title", ""), message.get("webpage_url", ""),
+                      url=message["url"], acodec=message.get("acodec"), asr=message.get("asr"))
+        started = time.monotonic()
+        try:
+            source = await create_source(
+                track,
+                executable=message["executable"],
+                before_options=message.get("before_options", ""),
+                options=message.get("options", "-vn"),
+                mode=message.get("mode", "auto"),
+                start=message.get("start", 0),
+            )
+        except Exception as e:
+            self.send({"op": "end", "guild": guild_id, "session": message["session"],
+                       "reason": "error", "error": str(e)})
+            return
+        if self.latest.get(guild_id) != message["session"]:
+            source.cleanup()  # Superseded by a newer play while FFmpeg was starting
+            return
+        self.send({"op": "started", "guild": guild_id, "session": message["session"],
+                   "mode": message.get("mode", "auto"), "passthrough": source.is_opus(),
+                   "spawn": time.monotonic() - started})
+        if not source.is_opus():
+            source = FilteredSource(source, filters)
+        self.sessions[guild_id] = Session(self, guild_id, message["session"], source, filters, message["credit"])
+
+    async def handle(self, message):
+        op = message.get("op")
+        session = self.sessions.get(message.get("guild"))
+        if session and message.get("session") not in (None, session.session_id):
+            session = None  # Meant for a session that has already been replaced
+        if op == "play":
+            await self.play(message)
+        elif op == "credit" and session:
+            session.grant(message["frames"])
+        elif op == "filters" and session:
+            apply_filters(session.filters, message["filters"])
+        elif op == "stop" and session:
+            session.close()
+        elif op == "ping":
+            self.send({"op": "pong", "id": message.get("id"), "guilds": len(self.sessions),
+                       "cpu": self.cpu_percent(), "frames": self.frames})
+
+    async def serve_client(self, reader, writer):
+        """One bot process per node; a new connection replaces the previous one"""
+        if self.writer:
+            self.writer.close()
+        self.writer = writer
+        try:
+            while True:
+                kind, body = await read_message(reader)
+                if kind == JSON:
+                    await self.handle(body)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if self.writer is writer:
+                # The bot went away: nothing would consume these sessions
+                for session in self.sessions.values():
+                    session.close()
+                self.sessions.clear()
+                self.latest.clear()
+                self.writer = None
+                if self.closed and not self.closed.done():
+                    self.closed.set_result(None)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--once", action="store_true", help="exit when the first bot connection closes")
+    args = parser.parse_args()
+
+    if not discord.opus.is_loaded():
+        discord.opus._load_default()
+    node = AudioNode()
+    node.loop = asyncio.get_running_loop()
+    server = await asyncio.start_server(node.serve_client, args.host, args.port)
+    port = server.sockets[0].getsockname()[1]
+    print(f"LISTENING {port}", flush=True)
+    async with server:
+        if args.once:
+            # Started by the bot: don't outlive its connection
+            node.closed = node.loop.create_future()
+            await node.closed
+        else:
+            await server.serve_forever()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+import os
+import time
+from collections import OrderedDict
+
+# Track cache configuration
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 4096))
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", 24 * 3600))
+STREAM_CACHE_SIZE = int(os.getenv("STREAM_CACHE_SIZE", 1024))
+STREAM_DEFAULT_TTL = 3600  # Used when a stream URL carries no expire= parameter
+STREAM_EXPIRY_MARGIN = 300  # Drop stream URLs this many seconds before they expire
+
+def normalize_query(query):
+    """Collapse whitespace, and case for plain searches (URLs are case-sensitive)"""
+    query = " ".join(query.split())
+    if "://" in query:
+        return query
+    return query.lower()
+
+class TTLCache:
+    """LRU-bounded mapping whose entries also expire after a per-entry TTL"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self._data[key] = (time.time() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+class TrackCache:
+    """Two-level cache: query -> track reference, then video id -> resolved track.
+
+    Query entries hold the video id, title and page URL and are long-lived.
+    Stream entries live until shortly before the expire= time signed into
+    their googlevideo URL, after which only the stream has to be
+    re-extracted (from the page URL, no new search).
+    """
+
+    def __init__(self, query_size=QUERY_CACHE_SIZE, query_ttl=QUERY_CACHE_TTL,
+                 stream_size=STREAM_CACHE_SIZE):
+        self.queries = TTLCache(query_size, query_ttl)
+        self.streams = TTLCache(stream_size, STREAM_DEFAULT_TTL)
+
+    def ref(self, query):
+        """Cached track reference for a query, or None"""
+        return self.queries.get(normalize_query(query))
+
+    def lookup(self, query):
+        """Return (track reference, resolved track) for a query; either may be None"""
+        ref = self.ref(query)
+        if ref is None:
+            return None, None
+        return ref, self.streams.get(ref.id)
+
+    def put_ref(self, query, ref):
+        if not ref.id:
+            return
+        self.queries.set(normalize_query(query), ref)
+        if ref.webpage_url:
+            self.queries.set(normalize_query(ref.webpage_url), ref)
+
+    def put(self, query, track):
+        """Cache a resolved track under both its query and video id"""
+        if not track.id:
+            return
+        self.put_ref(query, track.reference())
+        if track.expires_at is None:
+            ttl = STREAM_DEFAULT_TTL
+        else:
+            ttl = track.expires_at - STREAM_EXPIRY_MARGIN - time.time()
+        if ttl > 0:
+            self.streams.set(track.id, track, ttl)
+
+    def discard_stream(self, video_id):
+        """Forget a stream URL that stopped working before its expiry"""
+        self.streams.pop(video_id)
+
+    def stats(self):
+        return {"queries": self.queries.stats(), "streams": self.streams.stats()}
@@ -0,0 +1,137 @@
+import asyncio
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.extractor import download_audio
+
+# Disk cache configuration, disabled unless AUDIO_CACHE_DIR is set
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR")
+AUDIO_CACHE_MAX_MB = int(os.getenv("AUDIO_CACHE_MAX_MB", 2048))
+AUDIO_CACHE_MIN_PLAYS = int(os.getenv("AUDIO_CACHE_MIN_PLAYS", 3))  # Plays before a track is downloaded
+AUDIO_CACHE_MAX_DURATION = 15 * 60  # Don't store long mixes/streams
+PLAY_COUNT_LIMIT = 10000  # Tracks whose play counts are remembered
+
+class AudioCache:
+    """Size-bounded local copies of frequently played tracks.
+
+    A track is only downloaded once it has been played min_plays times
+    (frequency admission); once the directory exceeds max_bytes the least
+    recently played files are deleted first.
+    """
+
+    def __init__(self, directory, max_bytes, min_plays=AUDIO_CACHE_MIN_PLAYS, upstream=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_plays = min_plays
+        self.upstream = upstream  # Resolver.upstream, so downloads share its pacing and circuit breaker
+        self.files = OrderedDict()  # video_id -> (path, size), least recently played first
+        self.play_counts = OrderedDict()  # video_id -> plays, LRU-bounded
+        self.downloading = set()
+        self.tasks = set()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        self.downloads = 0
+        # Downloads get their own worker so they never hold up resolver slots
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio-cache")
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Pick up files left by a previous run, oldest access first"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith((".part", ".ytdl")):
+                stat = entry.stat()
+                entries.append((stat.st_atime, entry.name.split(".", 1)[0], entry.path, stat.st_size))
+        for _, video_id, path, size in sorted(entries):
+            self.files[video_id] = (path, size)
+            self.total_bytes += size
+        self._evict()
+
+    def get(self, video_id):
+        """Local file for a video id, or None"""
+        entry = self.files.get(video_id)
+        if entry is None or not os.path.exists(entry[0]):
+            if entry is not None:
+                self._remove(video_id)
+            self.misses += 1
+            return None
+        self.files.move_to_end(video_id)
+        self.hits += 1
+        self.bytes_saved += entry[1]
+        return entry[0]
+
+    def record_play(self, track):
+        """Count a play and start a background download once the track is hot"""
+        video_id = track.id
+        if not video_id or video_id in self.files or video_id in self.downloading:
+            return
+        if (track.duration or 0) > AUDIO_CACHE_MAX_DURATION:
+            return
+        plays = self.play_counts.pop(video_id, 0) + 1
+        self.play_counts[video_id] = plays
+        if len(self.play_counts) > PLAY_COUNT_LIMIT:
+            self.play_counts.popitem(last=False)
+        if plays >= self.min_plays:
+            self.downloading.add(video_id)
+            task = asyncio.create_task(self._download(video_id, track.webpage_url))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _download(self, video_id, url):
+        loop = asyncio.get_running_loop()
+
+        def download(client=None):
+            return loop.run_in_executor(self.executor, download_audio, url, self.directory, client)
+        try:
+            path = await (self.upstream(download) if self.upstream else download())
+        except Exception:
+            return  # Keep streaming it; the next plays will try again
+        finally:
+            self.downloading.discard(video_id)
+        self.play_counts.pop(video_id, None)
+        self.downloads += 1
+        size = os.path.getsize(path)
+        self.files[video_id] = (path, size)
+        self.total_bytes += size
+        self._evict()
+
+    def _remove(self, video_id):
+        path, size = self.files.pop(video_id)
+        self.total_bytes -= size
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.files:
+            self._remove(next(iter(self.files)))
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "files": len(self.files),
+            "size_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "evictions": self.evictions,
+            "downloads": self.downloads,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def create_audio_cache(upstream=None):
+    """AudioCache from the environment, or None when disabled"""
+    if not AUDIO_CACHE_DIR:
+        return None
+    return AudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_MB * 1024 * 1024, upstream=upstream)
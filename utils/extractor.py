@@ -0,0 +1,203 @@
+import copy
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+
+import yt_dlp as ytdl
+
+from utils.track import Track
+
+YTDL_OPTS = {
+    "format": "bestaudio[abr<=320]/bestaudio[ext=webm]/bestaudio[ext=m4a]/bestaudio/best",
+    "noplaylist": True,
+    "default_search": "ytsearch",
+    "quiet": True,
+    "extract_flat": False,
+    "forceurl": True,
+    "skip_download": True,
+    "source_address": "0.0.0.0",
+    "prefer_ffmpeg": True,
+    "extractor_args": {
+        "youtube": {
+            "player_client": ["web"],
+            "player_skip": ["configs", "webpage"],
+            "skip": ["dash", "hls"]
+        }
+    },
+    "http_headers": {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    }
+}
+
+# YouTube player clients to fall back on, in order, when one gets throttled or bot-checked
+PLAYER_CLIENTS = [c.strip() for c in os.getenv("YTDL_PLAYER_CLIENTS", "web,mweb,tv,web_safari").split(",") if c.strip()] or ["web"]
+
+# Error messages meaning YouTube is limiting us rather than the video being unavailable
+THROTTLE_MARKERS = ("http error 429", "too many requests", "rate-limit", "rate limit",
+                    "sign in to confirm", "not a bot", "http error 403")
+
+# Extractors instantiated up front so the first play on a worker doesn't pay for them
+WARM_EXTRACTORS = ("Youtube", "YoutubeSearch", "YoutubeTab", "Generic")
+
+PLAYLIST_CURSORS = 16  # Playlists whose entry generator is kept for the next page
+
+_local = threading.local()  # One YoutubeDL per player client per worker thread (or process)
+_cookiejar = None
+_cookiejar_lock = threading.Lock()
+_playlists = OrderedDict()  # (url, client) -> PlaylistCursor, least recently used first
+_playlists_lock = threading.Lock()
+
+def is_throttled(error):
+    """Whether an extraction error is YouTube throttling or bot-checking us"""
+    message = str(error).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+def ydl_options(client=None):
+    """YTDL_OPTS, with the YouTube player client swapped for client if given"""
+    opts = copy.deepcopy(YTDL_OPTS)
+    if client:
+        opts["extractor_args"]["youtube"]["player_client"] = [client]
+    return opts
+
+def new_ydl(client=None):
+    """Build a YoutubeDL instance with its extractors loaded"""
+    global _cookiejar
+    ydl = ytdl.YoutubeDL(ydl_options(client))
+    # Share one cookie jar between the workers of a process (CookieJar is
+    # thread-safe); each instance keeps its own pooled HTTP connections.
+    with _cookiejar_lock:
+        if _cookiejar is None:
+            _cookiejar = ydl.cookiejar
+        else:
+            vars(ydl)["cookiejar"] = _cookiejar
+    for ie_key in WARM_EXTRACTORS:
+        ydl.get_info_extractor(ie_key)
+    return ydl
+
+def get_ydl(client=None):
+    """Return this worker's long-lived YoutubeDL for a player client, creating it on first use"""
+    client = client or PLAYER_CLIENTS[0]  # So the default shares the first client's instance
+    ydls = getattr(_local, "ydls", None)
+    if ydls is None:
+        ydls = _local.ydls = {}
+    ydl = ydls.get(client)
+    if ydl is None:
+        ydl = ydls[client] = new_ydl(client)
+    return ydl
+
+def warm_worker():
+    """Executor initializer: build the worker's YoutubeDL before the first play"""
+    get_ydl(PLAYER_CLIENTS[0])
+
+def parse_info(info, query):
+    if "entries" in info:
+        info = info["entries"][0]
+    return Track.from_info(info, query)
+
+def get_youtube_audio(query, client=None):
+    """Blocking yt-dlp extraction, run this on the resolver pool only"""
+    info = get_ydl(client).extract_info(query, download=False)
+    return parse_info(info, query)
+
+def get_track_ref(query, client=None):
+    """Cheap enqueue-time lookup: video id, title and page URL, no stream URL.
+
+    Searches only fetch the first flat search result. URLs still need a full
+    extraction, so the returned Track is then already resolved.
+    """
+    ydl = get_ydl(client)
+    if "://" in query:
+        return get_youtube_audio(query, client)
+    result = ydl.extract_info(f"ytsearch1:{query}", download=False, process=False)
+    entry = next(iter(result.get("entries") or ()), None)
+    if entry is None:
+        raise ytdl.utils.DownloadError(f"No results found for {query}")
+    return flat_ref(entry)
+
+def flat_ref(entry):
+    """Track reference from a flat (unprocessed) search or playlist entry"""
+    return Track(
+        id=entry["id"],
+        title=entry.get("title") or "Unknown Title",
+        webpage_url=f"https://www.youtube.com/watch?v={entry['id']}",
+        duration=entry.get("duration"),
+    )
+
+# Placeholders YouTube leaves in playlists for videos that can't be played
+UNAVAILABLE_TITLES = ("[Private video]", "[Deleted video]")
+
+def playlist_url(query):
+    """Canonical playlist URL if the query is a YouTube playlist link, else None"""
+    if "://" not in query:
+        return None
+    url = urlparse(query.strip())
+    if "youtube.com" not in url.netloc and "youtu.be" not in url.netloc:
+        return None
+    params = parse_qs(url.query)
+    list_id = params.get("list")
+    # A video shared from a playlist or mix (watch?v=...&list=..., youtu.be/ID?list=...)
+    # plays just that video; noplaylist keeps yt-dlp from expanding it
+    if not list_id or "v" in params or "youtu.be" in url.netloc:
+        return None
+    return f"https://www.youtube.com/playlist?list={list_id[0]}"
+
+class PlaylistCursor:
+    """A flat playlist extraction and how far its lazy entries have been read"""
+
+    def __init__(self, result):
+        self.title = result.get("title") or "Playlist"
+        self.entries = iter(result.get("entries") or ())
+        self.position = 0
+
+    def take(self, count):
+        entries = list(itertools.islice(self.entries, count))
+        self.position += len(entries)
+        return entries
+
+def get_playlist_page(url, start, end, client=None):
+    """Flat-extract playlist entries [start, end) as track references.
+
+    Nothing is resolved per entry. The entries generator is kept between
+    calls, so a page that starts where the previous one stopped only fetches
+    the continuations it needs instead of walking the playlist from the top.
+    """
+    key = (url, client)
+    with _playlists_lock:
+        cursor = _playlists.pop(key, None)  # Taken, so no other worker reads the same generator
+    if cursor is None or cursor.position != start:
+        cursor = PlaylistCursor(get_ydl(client).extract_info(url, download=False, process=False))
+        cursor.take(start)
+    entries = cursor.take(end - start)
+    complete = len(entries) < end - start
+    if not complete:
+        with _playlists_lock:
+            _playlists[key] = cursor
+            while len(_playlists) > PLAYLIST_CURSORS:
+                _playlists.popitem(last=False)
+    refs = [
+        flat_ref(entry) for entry in entries
+        if entry and entry.get("id") and entry.get("title") not in UNAVAILABLE_TITLES
+    ]
+    return {"title": cursor.title, "entries": refs, "complete": complete}
+
+def download_audio(url, directory, client=None):
+    """Download a track's audio (Opus where available) into directory, return the file path"""
+    opts = ydl_options(client)
+    opts.update({
+        "format": "bestaudio[acodec=opus]/bestaudio",
+        "skip_download": False,
+        "forceurl": False,
+        "outtmpl": os.path.join(directory, "%(id)s.%(ext)s"),
+    })
+    # yt-dlp writes to a .part file and renames it when done, so players never see half a file
+    with ytdl.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=True)
+        return info["requested_downloads"][0]["filepath"]
+
+def get_youtube_audio_cold(query):
+    """Old per-query path (fresh YoutubeDL every call), kept for benchmarks"""
+    with ytdl.YoutubeDL(copy.deepcopy(YTDL_OPTS)) as ydl:
+        info = ydl.extract_info(query, download=False)
+        return parse_info(info, query)
@@ -0,0 +1,76 @@
+import asyncio
+import shutil
+
+RECONNECT_OPTIONS = "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5"
+
+async def _run(*args):
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        out, _ = await proc.communicate()
+    except OSError:
+        return ""
+    return out.decode(errors="replace")
+
+def _parse_names(output, marker):
+    """Second column of an FFmpeg listing such as -muxers"""
+    names = set()
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) >= 3 and parts[1] != "=" and marker(parts):
+            names.add(parts[1])
+    return frozenset(names)
+
+class FFmpegCapabilities:
+    """What the installed FFmpeg can do, probed once at startup.
+
+    Players share one instance and read their FFmpeg options and audio
+    mode from it, so a refresh() (e.g. after installing FFmpeg) applies to
+    the next track without restarting the bot.
+    """
+
+    def __init__(self, executable="ffmpeg"):
+        self.executable = executable
+        self.path = None
+        self.version = None
+        self.muxers = frozenset()
+        self.reconnect = False
+
+    @property
+    def available(self):
+        return self.path is not None
+
+    async def refresh(self):
+        self.path = shutil.which(self.executable)
+        if self.path is None:
+            self.version = None
+            self.muxers = frozenset()
+            self.reconnect = False
+            return self
+
+        version, muxers, http_help = await asyncio.gather(
+            _run(self.path, "-hide_banner", "-version"),
+            _run(self.path, "-hide_banner", "-muxers"),
+            _run(self.path, "-hide_banner", "-h", "protocol=http"),
+        )
+        first_line = version.splitlines()[0].split() if version.strip() else []
+        self.version = first_line[2] if len(first_line) > 2 else "unknown"
+        self.muxers = _parse_names(muxers, lambda parts: "E" in parts[0])
+        self.reconnect = "-reconnect_streamed" in http_help
+        return self
+
+    @property
+    def opus_passthrough(self):
+        """Codec copy into discord.py's Ogg Opus stream needs FFmpeg's opus muxer"""
+        return "opus" in self.muxers
+
+    def audio_mode(self, mode):
+        """mode, or "pcm" when this FFmpeg can't pass Opus through"""
+        return mode if self.opus_passthrough else "pcm"
+
+    def before_options(self):
+        return RECONNECT_OPTIONS if self.reconnect else ""
+
+    def options(self):
+        return "-vn"
@@ -0,0 +1,120 @@
+import math
+import os
+
+from aiohttp import web
+from discord.ext import commands
+
+from utils.metrics import REGISTRY
+
+# HTTP port required by hosting platforms, also used for orchestrator probes
+PORT = int(os.getenv("PORT", 8080))
+HEALTH_MAX_LATENCY = float(os.getenv("HEALTH_MAX_LATENCY", 10))  # Seconds of gateway latency before /healthz fails
+
+def _latency(value):
+    """Seconds, or None while a shard has no heartbeat yet (NaN/inf)"""
+    return value if math.isfinite(value) else None
+
+class HealthServer:
+    """aiohttp server on the bot's own event loop.
+
+        /          plain text, for platforms that only need the port bound
+        /healthz   gateway connected and latency under HEALTH_MAX_LATENCY
+        /readyz    extensions loaded and slash commands synced
+        /status    JSON playback status of every guild with a player
+        /status/{guild_id}
+        /metrics   Prometheus text format
+
+    Probes fail with 503 and a JSON body saying why.
+    """
+
+    def __init__(self, bot, extensions, port=PORT, max_latency=HEALTH_MAX_LATENCY):
+        self.bot = bot
+        self.extensions = list(extensions)
+        self.port = port
+        self.max_latency = max_latency
+        self.commands_synced = False  # Set by on_ready once the tree is synced (or doesn't need to be)
+        self.runner = None
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/", self.index)
+        app.router.add_get("/healthz", self.healthz)
+        app.router.add_get("/readyz", self.readyz)
+        app.router.add_get("/status", self.status)
+        app.router.add_get("/status/{guild_id}", self.status)
+        app.router.add_get("/metrics", self.metrics)
+        return app
+
+    async def start(self, host="0.0.0.0"):
+        self.runner = web.AppRunner(self.app(), access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, self.port).start()
+
+    async def close(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    def shard_latencies(self):
+        if isinstance(self.bot, commands.AutoShardedBot):
+            return {shard_id: _latency(latency) for shard_id, latency in self.bot.latencies}
+        return {self.bot.shard_id or 0: _latency(self.bot.latency)}
+
+    def health(self):
+        """(healthy, details)"""
+        latencies = self.shard_latencies()
+        problems = []
+        if self.bot.is_closed():
+            problems.append("client closed")
+        elif not self.bot.is_ready():
+            problems.append("gateway not ready")
+        for shard_id, latency in latencies.items():
+            if latency is None:
+                problems.append(f"shard {shard_id} has no heartbeat")
+            elif latency > self.max_latency:
+                problems.append(f"shard {shard_id} latency {latency:.1f}s")
+        details = {
+            "latency_ms": {
+                str(shard_id): latency * 1000 if latency is not None else None
+                for shard_id, latency in latencies.items()
+            },
+            "problems": problems,
+        }
+        return not problems, details
+
+    def readiness(self):
+        """(ready, details)"""
+        missing = [name for name in self.extensions if name not in self.bot.extensions]
+        problems = [f"extension {name} not loaded" for name in missing]
+        if not self.commands_synced:
+            problems.append("slash commands not synced")
+        return not problems, {"extensions": self.extensions, "problems": problems}
+
+    def _probe(self, ok, details):
+        return web.json_response({"status": "ok" if ok else "fail", **details}, status=200 if ok else 503)
+
+    async def index(self, request):
+        return web.Response(text="Discord Bot is running!")
+
+    async def healthz(self, request):
+        return self._probe(*self.health())
+
+    async def readyz(self, request):
+        return self._probe(*self.readiness())
+
+    async def status(self, request):
+        music = self.bot.get_cog("MusicCog")
+        guild_id = request.match_info.get("guild_id")
+        if guild_id is None:
+            return web.json_response({"guilds": music.guild_status() if music else []})
+        try:
+            guild_id = int(guild_id)
+        except ValueError:
+            raise web.HTTPBadRequest(text="Guild id must be a number")
+        status = music.guild_status(guild_id) if music else None
+        if status is None:
+            raise web.HTTPNotFound(text="No player for that guild")
+        return web.json_response(status)
+
+    async def metrics(self, request):
+        return web.Response(body=REGISTRY.render().encode(),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
@@ -0,0 +1,44 @@
+import asyncio
+
+from utils.metrics import LOOP_LAG
+
+LOOP_LAG_INTERVAL = 0.5  # Seconds between samples
+
+class LoopLagMonitor:
+    """How late the event loop wakes a sleeping task, i.e. how long it was blocked.
+
+    Every shard in a process shares one loop, so this is a per-process
+    figure; a shard's gateway latency is reported separately by discord.py.
+    """
+
+    def __init__(self, interval=LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.last = 0.0
+        self.average = 0.0  # Exponential moving average over roughly the last 10 samples
+        self.max = 0.0
+        self.task = None
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.last = max(loop.time() - started - self.interval, 0.0)
+            self.average += 0.1 * (self.last - self.average)
+            self.max = max(self.max, self.last)
+            LOOP_LAG.observe(self.last)
+
+    def stats(self):
+        return {
+            "lag_ms": self.last * 1000,
+            "avg_lag_ms": self.average * 1000,
+            "max_lag_ms": self.max * 1000,
+        }
@@ -0,0 +1,182 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers a 1 ms loop hiccup up to a slow 30 s extraction
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()  # Observed from voice and worker threads too
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}" for key, value in values]
+
+class Gauge(Metric):
+    """A value that is set, or read from func() at scrape time.
+
+    func may return a number, or a dict of label-value tuples to numbers.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), func=None):
+        super().__init__(name, help, labels)
+        self.func = func
+        self._values = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self.func:
+            values = self.func()
+            values = values.items() if isinstance(values, dict) else [((), values)]
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}" for key, value in values]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [per-bucket counts..., +Inf count], sum
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+class Registry:
+    """Metrics by name, rendered in the Prometheus text format.
+
+    Registering a name again replaces the old metric, so a reloaded cog
+    doesn't leave gauges pointing at its previous instance.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=(), func=None):
+        return self.register(Gauge(name, help, labels, func))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        blocks = []
+        for metric in list(self.metrics.values()):
+            try:
+                blocks.append(metric.render())
+            except Exception:
+                continue  # A gauge callback failing shouldn't break the whole scrape
+        return "\n".join(blocks) + "\n"
+
+REGISTRY = Registry()
+
+LOOP_LAG = REGISTRY.histogram(
+    "music_event_loop_lag_seconds", "How late the event loop woke a sleeping task"
+)
+RESOLVER_SECONDS = REGISTRY.histogram(
+    "music_resolver_call_seconds", "yt-dlp work run by the resolver, by function", ["func"]
+)
+FFMPEG_SPAWN_SECONDS = REGISTRY.histogram(
+    "music_ffmpeg_spawn_seconds", "Time to start FFmpeg (and probe the codec) for a track", ["mode"]
+)
+TIME_TO_FIRST_AUDIO = REGISTRY.histogram(
+    "music_time_to_first_audio_seconds",
+    "From taking a track off the queue to its first frame reaching the voice client",
+)
+RESOLVER_DEDUPLICATED = REGISTRY.counter(
+    "music_resolver_deduplicated_total", "Requests that joined an identical extraction already in flight", ["func"]
+)
+UPSTREAM_THROTTLED = REGISTRY.counter(
+    "music_upstream_throttled_total", "Extractions YouTube throttled or bot-checked, by player client", ["client"]
+)
+COMMAND_SECONDS = REGISTRY.histogram(
+    "music_command_seconds", "Command handling time, by command and entry point (prefix, slash, button)",
+    ["command", "via"]
+)
+COMMAND_ERRORS = REGISTRY.counter(
+    "music_command_errors_total", "Commands that raised, by command", ["command"]
+)
+INTERACTION_ACK_SECONDS = REGISTRY.histogram(
+    "music_interaction_ack_seconds",
+    "From an interaction's creation to its first response (Discord allows 3 s), by entry point", ["via"]
+)
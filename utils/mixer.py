@@ -0,0 +1,209 @@
+import os
+import threading
+from collections import deque
+
+import discord
+import numpy as np
+
+FRAME_SIZE = discord.opus.Encoder.FRAME_SIZE  # 20 ms of 48 kHz stereo s16le
+FRAMES_PER_SECOND = 50
+BUFFER_FRAMES = 50  # Decoded audio kept ahead of the voice thread per track
+CROSSFADE_SECONDS = float(os.getenv("CROSSFADE_SECONDS", 0))
+MIXER_MODE = os.getenv("MIXER", "auto").lower()  # auto (on when crossfading), on or off
+PRELOAD_SECONDS = 15  # How long before a track ends the next one is opened
+
+def crossfade(outgoing, incoming, start, end):
+    """Equal-power crossfade of two PCM frames, progress running from start to end (0..1)"""
+    a = np.frombuffer(outgoing, dtype=np.int16).reshape(-1, 2).astype(np.float32)
+    b = np.frombuffer(incoming, dtype=np.int16).reshape(-1, 2).astype(np.float32)
+    t = np.linspace(start, end, len(a), endpoint=False, dtype=np.float32)[:, None] * (np.pi / 2)
+    mixed = a * np.cos(t) + b * np.sin(t)
+    return np.clip(mixed, -32768, 32767).astype(np.int16).tobytes()
+
+class BufferedSource:
+    """Decodes a PCM AudioSource on its own thread into a ring buffer of frames.
+
+    The decoder starts as soon as this is created, so FFmpeg's start-up and
+    the first network reads happen while the previous track is still playing.
+    """
+
+    def __init__(self, source, track, start=0, capacity=BUFFER_FRAMES):
+        self.source = source
+        self.track = track
+        self.start = start  # Seconds into the track the source was opened at
+        self.capacity = capacity
+        self.frames = deque()
+        self.frames_read = 0
+        self.finished = False
+        self.closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._decode, name="mixer-decoder", daemon=True)
+        self._thread.start()
+
+    def _decode(self):
+        while True:
+            with self._cond:
+                while len(self.frames) >= self.capacity and not self.closed:
+                    self._cond.wait()
+                if self.closed:
+                    return
+            try:
+                data = self.source.read()
+            except Exception:
+                data = b""
+            with self._cond:
+                if len(data) == FRAME_SIZE:
+                    self.frames.append(data)
+                else:
+                    self.finished = True
+                self._cond.notify_all()
+                if self.finished:
+                    return
+
+    def read(self):
+        """Next frame, blocking like FFmpegPCMAudio would; b'' once the track has ended"""
+        with self._cond:
+            while not self.frames and not (self.finished or self.closed):
+                self._cond.wait()
+            if not self.frames:
+                return b""
+            data = self.frames.popleft()
+            self._cond.notify_all()
+        self.frames_read += 1
+        return data
+
+    @property
+    def position(self):
+        return self.start + self.frames_read / FRAMES_PER_SECOND
+
+    def remaining_frames(self):
+        """Frames left according to the track duration, or None if unknown"""
+        if not self.track.duration:
+            return None
+        return (self.track.duration - self.start) * FRAMES_PER_SECOND - self.frames_read
+
+    def cleanup(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self.source.cleanup()
+
+class MixerSource(discord.AudioSource):
+    """One long-lived AudioSource that plays tracks back to back.
+
+    The player queues the next track with queue_next() once it gets the
+    "near_end" notification; when the current track runs out the mixer
+    switches within the same 20 ms read (gapless), or crossfades over the
+    last crossfade_seconds when the track duration is known.
+    notify(kind, track) is called from the voice thread with "near_end"
+    (for the playing track) or "switched" (for the track now playing).
+    """
+
+    def __init__(self, notify, crossfade_seconds=CROSSFADE_SECONDS, preload_seconds=PRELOAD_SECONDS):
+        self.notify = notify
+        self.crossfade_frames = int(crossfade_seconds * FRAMES_PER_SECOND)
+        self.preload_frames = max(int(preload_seconds * FRAMES_PER_SECOND), self.crossfade_frames)
+        self.current = None
+        self.next = None
+        self.replacement = None  # Set by seek(), swapped in by the voice thread
+        self._skip = False  # Set by skip(), acted on by the voice thread
+        self._near_end_sent = False
+        self._lock = threading.Lock()
+
+    def is_opus(self):
+        return False
+
+    @property
+    def track(self):
+        return self.current.track if self.current else None
+
+    @property
+    def position(self):
+        """Seconds into the playing track"""
+        current = self.current
+        return current.position if current else 0
+
+    def start(self, track, source, start=0):
+        self.current = BufferedSource(source, track, start)
+
+    def seek(self, track, source, start):
+        """Replace the playing track with source, opened start seconds in"""
+        buffered = BufferedSource(source, track, start)
+        with self._lock:
+            old, self.replacement = self.replacement, buffered
+        if old:
+            old.cleanup()
+
+    def queue_next(self, track, source):
+        buffered = BufferedSource(source, track)
+        with self._lock:
+            old, self.next = self.next, buffered
+        if old:
+            old.cleanup()
+
+    def skip(self):
+        """Start the queued next track on the next read; False if none is queued yet"""
+        with self._lock:
+            if self.next is None:
+                return False
+            self._skip = True
+        return True
+
+    def pending_track(self):
+        """Track queued with queue_next() that never started playing"""
+        with self._lock:
+            return self.next.track if self.next else None
+
+    def read(self):
+        # Only the voice thread touches self.current; self.next is shared with
+        # the event loop, so it is only read or swapped under the lock.
+        with self._lock:
+            replacement, self.replacement = self.replacement, None
+            skip = self._skip and self.next is not None
+            self._skip = False
+        if replacement:
+            old, self.current = self.current, replacement
+            self._near_end_sent = False
+            threading.Thread(target=old.cleanup, daemon=True).start()
+        if self.current is None:
+            return b""
+        if skip:
+            return self._switch()
+        data = self.current.read()
+        if not data:
+            return self._switch()
+
+        remaining = self.current.remaining_frames()
+        if remaining is None:
+            return data
+        if not self._near_end_sent and remaining <= self.preload_frames:
+            self._near_end_sent = True
+            self.notify("near_end", self.current.track)
+        with self._lock:
+            incoming = self.next
+        if incoming and self.crossfade_frames and remaining <= self.crossfade_frames:
+            frame = incoming.read()
+            if frame:
+                start = 1 - remaining / self.crossfade_frames
+                data = crossfade(data, frame, start, start + 1 / self.crossfade_frames)
+            if remaining <= 1:
+                # Duration says the outgoing track is over; drop its (silent) tail
+                self._switch(read=False)
+        return data
+
+    def _switch(self, read=True):
+        with self._lock:
+            old, self.current, self.next = self.current, self.next, None
+        self._near_end_sent = False
+        # Reaping FFmpeg can block, keep it off the voice thread
+        threading.Thread(target=old.cleanup, daemon=True).start()
+        if self.current is None:
+            return b""
+        self.notify("switched", self.current.track)
+        return self.current.read() if read else b""
+
+    def cleanup(self):
+        with self._lock:
+            for buffered in (self.current, self.next, self.replacement):
+                if buffered:
+                    buffered.cleanup()
@@ -0,0 +1,34 @@
+import json
+import struct
+
+# Every message is a 5-byte header (payload length, kind) followed by the payload.
+# JSON messages carry control ops; AUDIO messages carry one Opus packet for a
+# guild's playback session, prefixed with (guild id, session id).
+HEADER = struct.Struct(">IB")
+AUDIO_HEADER = struct.Struct(">QI")
+JSON = 0
+AUDIO = 1
+MAX_PAYLOAD = 1 << 20
+
+class ProtocolError(Exception):
+    """Raised when a node sends something that isn't a valid message"""
+
+def pack_json(message):
+    payload = json.dumps(message, separators=(",", ":")).encode()
+    return HEADER.pack(len(payload), JSON) + payload
+
+def pack_audio(guild_id, session, packet):
+    return HEADER.pack(AUDIO_HEADER.size + len(packet), AUDIO) + AUDIO_HEADER.pack(guild_id, session) + packet
+
+async def read_message(reader):
+    """Next (kind, body) from a stream: a dict for JSON, (guild_id, session, packet) for AUDIO"""
+    length, kind = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_PAYLOAD:
+        raise ProtocolError(f"Message of {length} bytes is too large")
+    payload = await reader.readexactly(length)
+    if kind == JSON:
+        return kind, json.loads(payload)
+    if kind == AUDIO:
+        guild_id, session = AUDIO_HEADER.unpack_from(payload)
+        return kind, (guild_id, session, payload[AUDIO_HEADER.size:])
+    raise ProtocolError(f"Unknown message kind {kind}")
@@ -0,0 +1,342 @@
+import asyncio
+import itertools
+import os
+import queue
+import sys
+
+import discord
+
+from utils.audio import is_opus_48k
+from utils.metrics import FFMPEG_SPAWN_SECONDS
+from utils.node_protocol import AUDIO, JSON, pack_json, read_message
+
+# Audio worker configuration; with AUDIO_NODES=0 audio is handled in the bot process
+AUDIO_NODES = int(os.getenv("AUDIO_NODES", 0))
+NODE_HEALTH_INTERVAL = 5  # Seconds between pings
+NODE_HEALTH_TIMEOUT = 3
+NODE_MAX_FAILURES = 3  # Missed pings before a node is restarted
+NODE_GUILD_WEIGHT = 2  # CPU % a new guild is assumed to cost until the node reports it
+INITIAL_CREDIT = 100  # Packets a node may send ahead of playback (2 s)
+CREDIT_BATCH = 10
+READ_TIMEOUT = 10  # Seconds without a packet before a stream counts as dead
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class NodeUnavailable(Exception):
+    """Raised when no healthy audio node can take a guild"""
+
+class NodeSource(discord.AudioSource):
+    """Opus packets streamed from an audio node for one guild's playback session"""
+
+    def __init__(self, node, guild_id, session, passthrough=False):
+        self.node = node
+        self.guild_id = guild_id
+        self.session = session
+        self.passthrough = passthrough  # Expected until the node reports what it opened
+        self.packets = queue.Queue()
+        self.consumed = 0
+
+    def is_opus(self):
+        return True
+
+    def feed(self, packet):
+        self.packets.put(packet)
+
+    def finish(self):
+        self.packets.put(None)
+
+    def read(self):
+        try:
+            packet = self.packets.get(timeout=READ_TIMEOUT)
+        except queue.Empty:
+            return b""
+        if packet is None:
+            self.packets.put(None)  # Keep returning b"" after the end
+            return b""
+        self.consumed += 1
+        if self.consumed % CREDIT_BATCH == 0:
+            self.node.send_threadsafe({"op": "credit", "guild": self.guild_id,
+                                       "session": self.session, "frames": CREDIT_BATCH})
+        return packet
+
+    def cleanup(self):
+        self.node.release(self)
+
+class NodeClient:
+    """Connection to one audio node (see utils.audio_node)"""
+
+    def __init__(self, name, host, port):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.loop = None
+        self.sources = {}  # guild_id -> NodeSource
+        self.sessions = itertools.count(1)
+        self.pings = {}  # ping id -> future
+        self.ping_ids = itertools.count(1)
+        self.read_task = None
+        self.healthy = False
+        self.failures = 0
+        self.cpu = 0.0  # As last reported by the node
+        self.latency = None
+
+    @property
+    def alive(self):
+        return self.writer is not None and not self.writer.is_closing()
+
+    async def connect(self):
+        self.loop = asyncio.get_running_loop()
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.read_task = asyncio.create_task(self._read_loop())
+        self.healthy = True
+        self.failures = 0
+
+    async def _read_loop(self):
+        try:
+            while True:
+                kind, body = await read_message(self.reader)
+                if kind == AUDIO:
+                    guild_id, session, packet = body
+                    source = self.sources.get(guild_id)
+                    if source and source.session == session:
+                        source.feed(packet)
+                elif kind == JSON:
+                    self._handle(body)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            pass
+        finally:
+            self._disconnected()
+
+    def _handle(self, message):
+        op = message.get("op")
+        if op == "pong":
+            future = self.pings.pop(message.get("id"), None)
+            if future and not future.done():
+                future.set_result(message)
+        elif op == "started":
+            source = self.sources.get(message["guild"])
+            if source and source.session == message["session"]:
+                source.passthrough = message["passthrough"]
+            FFMPEG_SPAWN_SECONDS.observe(message["spawn"], mode=message["mode"])
+        elif op == "end":
+            source = self.sources.get(message["guild"])
+            if source and source.session == message["session"]:
+                del self.sources[message["guild"]]
+                source.finish()
+
+    def _disconnected(self):
+        self.healthy = False
+        # Players see their streams end early and resume elsewhere
+        for source in self.sources.values():
+            source.finish()
+        self.sources.clear()
+        for future in self.pings.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Audio node disconnected"))
+        self.pings.clear()
+
+    def send(self, message):
+        if self.writer and not self.writer.is_closing():
+            self.writer.write(pack_json(message))
+
+    def send_threadsafe(self, message):
+        self.loop.call_soon_threadsafe(self.send, message)
+
+    def play(self, guild_id, track, filters, start=0, **options):
+        """Start track on this node, replacing the guild's current session; returns its NodeSource.
+
+        The old session's buffered packets stay readable, so a seek can swap
+        sources without the voice client running dry in between.
+        """
+        mode = options.get("mode", "auto")
+        passthrough = mode == "opus" or (mode == "auto" and is_opus_48k(track.acodec, track.asr))
+        source = NodeSource(self, guild_id, next(self.sessions), passthrough)
+        self.sources[guild_id] = source
+        self.send({
+            "op": "play", "guild": guild_id, "session": source.session,
+            "id": track.id, "url": track.url, "acodec": track.acodec, "asr": track.asr,
+            "start": start, "filters": filter_settings(filters), "credit": INITIAL_CREDIT,
+            **options,
+        })
+        return source
+
+    def release(self, source):
+        """Stop a source's session; safe to call from the voice thread"""
+        def release():
+            if self.sources.get(source.guild_id) is source:
+                del self.sources[source.guild_id]
+                self.send({"op": "stop", "guild": source.guild_id, "session": source.session})
+        if not self.loop.is_closed():  # AudioSource.__del__ may run after shutdown
+            self.loop.call_soon_threadsafe(release)
+
+    def update_filters(self, guild_id, filters):
+        source = self.sources.get(guild_id)
+        if source:
+            self.send({"op": "filters", "guild": guild_id, "session": source.session,
+                       "filters": filter_settings(filters)})
+
+    async def ping(self):
+        """Round trip to the node; updates its reported load"""
+        ping_id = next(self.ping_ids)
+        future = self.loop.create_future()
+        self.pings[ping_id] = future
+        started = self.loop.time()
+        self.send({"op": "ping", "id": ping_id})
+        try:
+            reply = await asyncio.wait_for(future, NODE_HEALTH_TIMEOUT)
+        finally:
+            self.pings.pop(ping_id, None)
+        self.latency = self.loop.time() - started
+        self.cpu = reply["cpu"]
+        return reply
+
+    async def close(self):
+        self.healthy = False
+        if self.writer:
+            self.writer.close()
+        if self.read_task:
+            self.read_task.cancel()
+
+class LocalNode(NodeClient):
+    """An audio node run as a child process of the bot"""
+
+    def __init__(self, name):
+        super().__init__(name, "127.0.0.1", None)
+        self.process = None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "utils.audio_node", "--port", "0", "--once",
+            cwd=ROOT, stdout=asyncio.subprocess.PIPE,
+        )
+        line = await asyncio.wait_for(self.process.stdout.readline(), 30)
+        if not line.startswith(b"LISTENING "):
+            await self.close()
+            raise NodeUnavailable(f"Audio node {self.name} failed to start")
+        self.port = int(line.split()[1])
+        await self.connect()
+        return self
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None and super().alive
+
+    async def close(self):
+        await super().close()
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+
+def filter_settings(filters):
+    return {"volume": filters.volume, "normalize": filters.normalize,
+            "bass_db": filters.bass_db, "rate": filters.rate}
+
+class NodePool:
+    """Local audio worker processes that MusicPlayers hand their tracks to.
+
+    Each node decodes, filters and encodes many guilds' audio, leaving the
+    bot process to forward ready Opus packets. A guild stays on its node
+    between tracks; new guilds go to the node with the least load (its
+    reported CPU plus an allowance per guild). Nodes are pinged every few
+    seconds and restarted after repeated failures; players whose node
+    goes away see their stream end early and resume on another node.
+    """
+
+    def __init__(self, count=AUDIO_NODES):
+        self.count = count
+        self.nodes = []
+        self.placements = {}  # guild_id -> node
+        self.restarts = 0
+        self.health_task = None
+
+    async def start(self):
+        self.nodes = list(await asyncio.gather(*(LocalNode(f"node-{i}").start() for i in range(self.count))))
+        self.health_task = asyncio.create_task(self._health_loop())
+        return self
+
+    def healthy_nodes(self):
+        return [node for node in self.nodes if node.healthy]
+
+    def load(self, node):
+        guilds = sum(1 for placed in self.placements.values() if placed is node)
+        return node.cpu + guilds * NODE_GUILD_WEIGHT
+
+    def place(self, guild_id):
+        node = self.placements.get(guild_id)
+        if node is None or not node.healthy:
+            healthy = self.healthy_nodes()
+            if not healthy:
+                raise NodeUnavailable("No audio node is available.")
+            node = min(healthy, key=self.load)
+            self.placements[guild_id] = node
+        return node
+
+    def play(self, guild_id, track, filters, start=0, **options):
+        return self.place(guild_id).play(guild_id, track, filters, start, **options)
+
+    def update_filters(self, guild_id, filters):
+        node = self.placements.get(guild_id)
+        if node:
+            node.update_filters(guild_id, filters)
+
+    def forget(self, guild_id):
+        self.placements.pop(guild_id, None)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(NODE_HEALTH_INTERVAL)
+            await asyncio.gather(*(self._check(node) for node in list(self.nodes)))
+
+    async def _check(self, node):
+        try:
+            if node.alive:
+                await node.ping()
+                node.failures = 0
+                node.healthy = True
+                return
+        except Exception:
+            pass
+        node.failures += 1
+        node.healthy = False
+        if not node.alive or node.failures >= NODE_MAX_FAILURES:
+            await self._restart(node)
+
+    async def _restart(self, node):
+        await node.close()
+        try:
+            replacement = await LocalNode(node.name).start()
+        except Exception:
+            return  # Try again on the next health check
+        self.nodes[self.nodes.index(node)] = replacement
+        self.restarts += 1
+        for guild_id, placed in list(self.placements.items()):
+            if placed is node:
+                del self.placements[guild_id]
+
+    def stats(self):
+        return [
+            {
+                "name": node.name,
+                "healthy": node.healthy,
+                "guilds": len(node.sources),
+                "cpu": node.cpu,
+                "latency_ms": node.latency * 1000 if node.latency is not None else None,
+            }
+            for node in self.nodes
+        ]
+
+    async def close(self):
+        if self.health_task:
+            self.health_task.cancel()
+        await asyncio.gather(*(node.close() for node in self.nodes))
+
+def create_node_pool():
+    """NodePool from the environment, or None when audio stays in the bot process"""
+    if AUDIO_NODES <= 0:
+        return None
+    return NodePool(AUDIO_NODES)
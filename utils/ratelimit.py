@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+
+# Upstream (YouTube) request limits
+UPSTREAM_RATE = float(os.getenv("UPSTREAM_RATE", 5))  # Extractions per second when healthy
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", 10))
+UPSTREAM_MIN_RATE = 0.2  # Backoff never goes below one extraction per 5 s
+RECOVERY_STEP = 0.1  # Share of the full rate regained per successful extraction
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", 5))  # Throttled extractions in a row before opening
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", 60))  # Seconds open before a trial extraction
+
+class TokenBucket:
+    """Paces calls to rate per second with bursts of up to burst calls.
+
+    The rate adapts to the upstream: backoff() halves it when a call is
+    throttled and recover() wins it back a step at a time on success
+    (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, rate=UPSTREAM_RATE, burst=UPSTREAM_BURST, min_rate=UPSTREAM_MIN_RATE):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waited = 0.0  # Total seconds callers spent waiting for a token
+        self._lock = asyncio.Lock()  # Waiters are served in arrival order
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+                self._refill()
+            self.tokens -= 1
+
+    def backoff(self):
+        self._refill()
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)  # No burst straight after being throttled
+
+    def recover(self):
+        self._refill()
+        self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
+
+    def stats(self):
+        self._refill()
+        return {"rate": self.rate, "max_rate": self.max_rate, "tokens": self.tokens, "waited": self.waited}
+
+class CircuitBreaker:
+    """Stops calls upstream after threshold failures in a row.
+
+    While open, allow() is False until reset_timeout has passed; then a
+    single trial call is let through (half-open), which closes the breaker
+    if it succeeds and opens it again if it fails.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.opens = 0
+        self.rejected = 0
+        self._trial = False  # A half-open trial call is in progress
+
+    def allow(self):
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._trial = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._trial:
+            self._trial = True
+            return True
+        self.rejected += 1
+        return False
+
+    def retry_after(self):
+        """Seconds until a trial call will be allowed"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def abandon(self):
+        """An allowed call ended without telling either way (e.g. it was cancelled)"""
+        self._trial = False
+
+    def success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial = False
+
+    def failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            if self.state != self.OPEN:
+                self.opens += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._trial = False
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opens": self.opens,
+            "rejected": self.rejected,
+            "retry_after": self.retry_after(),
+        }
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import time
+
+import discord
+
+ORANGE_COLOR = 0xFFA500
+QUEUE_NOTIFY_WINDOW = float(os.getenv("QUEUE_NOTIFY_WINDOW", 2))  # Seconds queue adds are gathered into one edit
+QUEUE_NOTIFY_LIST = 10  # Titles listed in a coalesced message
+
+_static = {}
+
+def static_embed(key, build):
+    """Embed that never changes once built (e.g. help), built on first use and then reused.
+
+    Sending only serialises an embed, so one instance can go out any number
+    of times; callers must not modify it.
+    """
+    embed = _static.get(key)
+    if embed is None:
+        embed = _static[key] = build()
+    return embed
+
+class PersistentMessage:
+    """A message kept current by editing it rather than posting a new one.
+
+    A new message is posted when there is none yet, it is in another
+    channel, it was deleted, or other messages have been posted below it
+    since (an edit there would go unseen).
+    """
+
+    def __init__(self):
+        self.message = None
+
+    def _editable(self, ctx):
+        if self.message is None or self.message.channel.id != ctx.channel.id:
+            return False
+        # Known from the gateway without a request; None when the channel isn't cached
+        last_id = getattr(ctx.channel, "last_message_id", None)
+        return last_id in (None, self.message.id)
+
+    async def update(self, ctx, **kwargs):
+        if self._editable(ctx):
+            try:
+                self.message = await self.message.edit(**kwargs) or self.message
+                return self.message
+            except discord.HTTPException:
+                pass  # Deleted, or an expired interaction followup
+        self.message = await ctx.send(**kwargs)
+        return self.message
+
+    def forget(self):
+        self.message = None
+
+class QueueNotifier:
+    """Coalesces a guild's "Added to Queue" messages.
+
+    The first add is announced straight away. Adds that follow within
+    QUEUE_NOTIFY_WINDOW are gathered and summarised by editing that same
+    message once the window passes, so a burst of adds costs two requests
+    instead of one per track. Slash commands are always answered directly,
+    since their interaction needs a reply.
+    """
+
+    def __init__(self, window=QUEUE_NOTIFY_WINDOW):
+        self.window = window
+        self.message = None
+        self.channel_id = None
+        self.tracks = []  # First QUEUE_NOTIFY_LIST (track, position) pairs added in the current burst
+        self.count = 0
+        self.last_position = None
+        self.window_end = 0.0
+        self.flush_task = None
+
+    async def added(self, ctx, track, position):
+        now = time.monotonic()
+        in_burst = (
+            self.message is not None
+            and self.channel_id == ctx.channel.id
+            and (now < self.window_end or self.flush_task)
+        )
+        if getattr(ctx, "interaction", None) is None and in_burst:
+            if len(self.tracks) < QUEUE_NOTIFY_LIST:
+                self.tracks.append((track, position))
+            self.count += 1
+            self.last_position = position
+            if self.flush_task is None:
+                self.flush_task = asyncio.create_task(self._flush())
+            return
+        self.message = await ctx.send(embed=added_embed([(track, position)]))
+        self.channel_id = ctx.channel.id
+        self.tracks = [(track, position)]
+        self.count = 1
+        self.last_position = position
+        self.window_end = now + self.window
+
+    async def _flush(self):
+        try:
+            while True:
+                await asyncio.sleep(max(self.window_end - time.monotonic(), 0))
+                shown = self.count
+                try:
+                    await self.message.edit(embed=added_embed(self.tracks, self.count, self.last_position))
+                except discord.HTTPException:
+                    pass
+                self.window_end = time.monotonic() + self.window
+                if self.count == shown:
+                    return  # Otherwise more were added while editing
+        finally:
+            self.flush_task = None
+
+    def cancel(self):
+        if self.flush_task:
+            self.flush_task.cancel()
+        self.message = None
+        self.tracks = []
+
+def added_embed(tracks, count=1, last_position=None):
+    """"Added to Queue" embed for one (track, queue position) pair, or a summary of count adds"""
+    if count == 1:
+        track, position = tracks[0]
+        embed = discord.Embed(title="✅ Added to Queue", description=f"**{track.title}**", color=ORANGE_COLOR)
+        embed.add_field(name="Position", value=f"{position}", inline=True)
+        return embed
+    lines = [f"**{track.title}**" for track, _ in tracks]
+    if count > len(tracks):
+        lines.append(f"...and {count - len(tracks)} more")
+    embed = discord.Embed(
+        title=f"✅ Added {count} Tracks to Queue",
+        description="\n".join(lines),
+        color=ORANGE_COLOR
+    )
+    embed.add_field(name="Positions", value=f"{tracks[0][1]}-{last_position}", inline=True)
+    return embed
@@ -0,0 +1,298 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from utils.cache import TrackCache, normalize_query
+from utils.extractor import (
+    PLAYER_CLIENTS, get_playlist_page, get_track_ref, get_youtube_audio, is_throttled, warm_worker
+)
+from utils.metrics import RESOLVER_DEDUPLICATED, RESOLVER_SECONDS, UPSTREAM_THROTTLED
+from utils.ratelimit import CircuitBreaker, TokenBucket
+
+# Resolver configuration
+RESOLVER_MODE = os.getenv("RESOLVER_MODE", "thread").lower()  # thread or process
+RESOLVER_WORKERS = int(os.getenv("RESOLVER_WORKERS", 4))
+RESOLVER_GUILD_LIMIT = int(os.getenv("RESOLVER_GUILD_LIMIT", 2))
+RESOLVER_MAX_PENDING = int(os.getenv("RESOLVER_MAX_PENDING", 32))
+PLAYLIST_FIRST_PAGE = 25  # Small first page so playback starts quickly
+PLAYLIST_PAGE_SIZE = 100  # Matches YouTube's continuation page size
+PLAYLIST_LIMIT = int(os.getenv("PLAYLIST_LIMIT", 500))
+
+class ResolverBusy(Exception):
+    """Raised when too many resolutions are already waiting for a worker"""
+
+class ResolverCancelled(Exception):
+    """Raised when a guild's pending resolutions were cancelled (stop/leave)"""
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of extracting while YouTube is throttling us (circuit breaker open)"""
+
+class Resolver:
+    """Runs yt-dlp extraction on a worker pool so the event loop never blocks.
+
+    Concurrency is capped globally (one slot per worker) and per guild, and
+    new requests are rejected with ResolverBusy once max_pending are queued.
+    Identical lookups and resolutions from any guild share one extraction
+    while it is in flight (single-flight), so a trending track is only
+    extracted once however many guilds play it at the same moment.
+
+    Extractions are paced by an adaptive token bucket. A throttled one is
+    retried with the next YouTube player client, and after repeated
+    throttling the circuit breaker opens: until it lets a trial extraction
+    through, only cached tracks can be played and everything else fails
+    fast with UpstreamUnavailable.
+    """
+
+    def __init__(self, mode=RESOLVER_MODE, workers=RESOLVER_WORKERS,
+                 guild_limit=RESOLVER_GUILD_LIMIT, max_pending=RESOLVER_MAX_PENDING):
+        if mode == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=warm_worker)
+            # Playlist pages always go to one process, which keeps each playlist's entry generator
+            self.playlist_executor = ProcessPoolExecutor(max_workers=1, initializer=warm_worker)
+        else:
+            self.executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="resolver", initializer=warm_worker
+            )
+            self.playlist_executor = self.executor
+        self.cache = TrackCache()
+        self.mode = mode
+        self.workers = workers
+        self.guild_limit = guild_limit
+        self.max_pending = max_pending
+        self.pending = 0
+        self._global_slots = asyncio.Semaphore(workers)
+        self._guild_slots = {}  # guild_id -> Semaphore
+        self._guild_pending = {}  # guild_id -> number of requests in flight
+        self._waiters = {}  # guild_id -> set of futures awaiting a worker result
+        self._cancelled = {}  # guild_id -> cancel generation, while requests are in flight
+        self._flights = {}  # (func name, query or video id) -> task running the extraction
+        self.extractions = 0
+        self.deduplicated = 0
+        self.limiter = TokenBucket()
+        self.breaker = CircuitBreaker()
+        self.clients = PLAYER_CLIENTS
+        self.client_index = 0  # Player client to try first; moves on when one is throttled
+        self.throttled = 0
+        self.retries = 0
+
+    async def lookup(self, guild_id, query):
+        """Cheap enqueue-time lookup of a track reference (id, title, page URL)"""
+        ref = self.cache.ref(query)
+        if ref is not None:
+            return ref
+        track = await self._shared(("ref", normalize_query(query)), guild_id, get_track_ref, query)
+        if track.resolved:
+            self.cache.put(query, track)
+        else:
+            self.cache.put_ref(query, track)
+        return track.reference()
+
+    async def resolve(self, guild_id, query, refresh=False):
+        """Resolve a query or page URL to a playable (resolved) Track.
+
+        refresh=True drops a cached stream URL first, e.g. after it failed mid-track.
+        """
+        if refresh:
+            ref = self.cache.ref(query)
+            if ref:
+                self.cache.discard_stream(ref.id)
+        ref, track = self.cache.lookup(query)
+        if track is not None:
+            return track
+        # A known video whose stream URL expired only needs re-extracting, not a new search
+        target = ref.webpage_url if ref else query
+        key = ("stream", ref.id if ref else normalize_query(query))
+        track = await self._shared(key, guild_id, get_youtube_audio, target)
+        self.cache.put(query, track)
+        return track
+
+    async def iter_playlist(self, guild_id, url):
+        """Async generator yielding (playlist title, track references) page by page"""
+        start, end = 0, PLAYLIST_FIRST_PAGE
+        while start < PLAYLIST_LIMIT:
+            page = await self._submit(guild_id, get_playlist_page, url, start, min(end, PLAYLIST_LIMIT))
+            yield page["title"], page["entries"]
+            if page["complete"]:
+                return
+            start, end = end, end + PLAYLIST_PAGE_SIZE
+
+    async def _shared(self, key, guild_id, func, *args):
+        """_submit, unless the same extraction is already in flight: then wait for that one.
+
+        The extraction runs under the guild that started it. If that guild
+        is stopped, waiters from other guilds start their own; a waiter's
+        own guild being stopped cancels only its wait.
+        """
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                self.extractions += 1
+                flight = asyncio.ensure_future(self._submit(guild_id, func, *args))
+                self._flights[key] = flight
+                flight.add_done_callback(lambda _: self._landed(key, flight))
+                # Shielded: the caller going away mustn't cancel the extraction for the other waiters
+                return await asyncio.shield(flight)
+            self.deduplicated += 1
+            RESOLVER_DEDUPLICATED.inc(func=func.__name__)
+            waiter = asyncio.shield(flight)
+            waiters = self._waiters.setdefault(guild_id, set())
+            waiters.add(waiter)
+            try:
+                return await waiter
+            except asyncio.CancelledError:
+                if waiter.cancelled() and not flight.cancelled() and not asyncio.current_task().cancelling():
+                    raise ResolverCancelled()
+                raise
+            except ResolverCancelled:
+                continue  # Another guild's request was cancelled, not this one
+            finally:
+                waiters.discard(waiter)
+                if not waiters and self._waiters.get(guild_id) is waiters:
+                    del self._waiters[guild_id]
+
+    def _landed(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            flight.exception()  # Retrieved here in case every waiter has gone
+
+    async def _submit(self, guild_id, func, *args):
+        if self.pending >= self.max_pending:
+            raise ResolverBusy("The music resolver is busy, please try again in a moment.")
+
+        self.pending += 1
+        self._guild_pending[guild_id] = self._guild_pending.get(guild_id, 0) + 1
+        guild_slot = self._guild_slots.setdefault(guild_id, asyncio.Semaphore(self.guild_limit))
+        generation = self._cancelled.get(guild_id, 0)
+        try:
+            async with guild_slot:
+                return await self._extract(guild_id, generation, func, *args)
+        finally:
+            self.pending -= 1
+            self._guild_pending[guild_id] -= 1
+            if not self._guild_pending[guild_id]:
+                del self._guild_pending[guild_id]
+                self._guild_slots.pop(guild_id, None)
+                self._cancelled.pop(guild_id, None)
+
+    async def _extract(self, guild_id, generation, func, *args):
+        return await self.upstream(lambda client: self._run(guild_id, generation, func, *args, client=client))
+
+    async def upstream(self, call):
+        """await call(client), paced by the limiter and guarded by the circuit breaker, trying each player client.
+
+        Everything that talks to YouTube goes through here, including the
+        audio cache's downloads.
+        """
+        for attempt in range(len(self.clients)):
+            if not self.breaker.allow():
+                raise UpstreamUnavailable(
+                    "YouTube is limiting requests right now, so only recently played tracks are available. "
+                    f"Please try again in {max(int(self.breaker.retry_after()), 1)}s."
+                )
+            index = self.client_index
+            try:
+                await self.limiter.acquire()
+                result = await call(self.clients[index])
+            except ResolverCancelled:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                if not is_throttled(e):
+                    self._upstream_ok()  # YouTube answered, the video itself is the problem
+                    raise
+                self._upstream_throttled(index)
+                if attempt == len(self.clients) - 1:
+                    raise UpstreamUnavailable("YouTube is limiting requests right now, please try again shortly.") from e
+                self.retries += 1
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            else:
+                self._upstream_ok()
+                return result
+
+    def _upstream_ok(self):
+        self.limiter.recover()
+        self.breaker.success()
+
+    def _upstream_throttled(self, index):
+        self.throttled += 1
+        UPSTREAM_THROTTLED.inc(client=self.clients[index])
+        self.limiter.backoff()
+        self.breaker.failure()
+        if self.client_index == index:
+            # Later requests start with the next client too
+            self.client_index = (index + 1) % len(self.clients)
+
+    async def _run(self, guild_id, generation, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        await self._global_slots.acquire()
+        try:
+            if self._cancelled.get(guild_id, 0) != generation:
+                raise ResolverCancelled()
+            submitted = time.perf_counter()
+            executor = self.playlist_executor if func is get_playlist_page else self.executor
+            work = executor.submit(func, *args, **kwargs)
+        except Exception:
+            self._global_slots.release()
+            raise
+
+        def done(_):
+            RESOLVER_SECONDS.observe(time.perf_counter() - submitted, func=func.__name__)
+            # Keep the global slot until the worker is really free, even if the
+            # waiter below gets cancelled while extraction is still running.
+            loop.call_soon_threadsafe(self._global_slots.release)
+        work.add_done_callback(done)
+
+        waiter = asyncio.wrap_future(work)
+        waiters = self._waiters.setdefault(guild_id, set())
+        waiters.add(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            # Cancelled through cancel_guild rather than the calling task
+            if waiter.cancelled() and not asyncio.current_task().cancelling():
+                raise ResolverCancelled()
+            raise
+        finally:
+            waiters.discard(waiter)
+            if not waiters and self._waiters.get(guild_id) is waiters:
+                del self._waiters[guild_id]
+
+    async def warm_up(self):
+        """Start every worker now so each has its YoutubeDL ready before the first play"""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self.executor, warm_worker) for _ in range(self.workers)
+        ))
+
+    def cancel_guild(self, guild_id):
+        """Cancel every pending resolution started for a guild"""
+        if guild_id in self._guild_pending:
+            self._cancelled[guild_id] = self._cancelled.get(guild_id, 0) + 1
+        for waiter in self._waiters.pop(guild_id, ()):
+            waiter.cancel()
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "pending": self.pending,
+            "extractions": self.extractions,
+            "deduplicated": self.deduplicated,
+            "upstream": {
+                **self.limiter.stats(),
+                "breaker": self.breaker.stats(),
+                "client": self.clients[self.client_index],
+                "throttled": self.throttled,
+                "retries": self.retries,
+            },
+            "cache": self.cache.stats(),
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.playlist_executor is not self.executor:
+            self.playlist_executor.shutdown(wait=False, cancel_futures=True)
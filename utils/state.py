@@ -0,0 +1,249 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.track import Track
+
+# State store configuration, disabled unless STATE_DB is set
+STATE_DB = os.getenv("STATE_DB")
+STATE_FLUSH_INTERVAL = float(os.getenv("STATE_FLUSH_INTERVAL", 1))  # Seconds between log writes
+STATE_SNAPSHOT_INTERVAL = int(os.getenv("STATE_SNAPSHOT_INTERVAL", 300))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guilds (
+    guild_id INTEGER PRIMARY KEY,
+    voice_channel_id INTEGER,
+    text_channel_id INTEGER,
+    always_on INTEGER NOT NULL DEFAULT 0,
+    now_playing TEXT,
+    position REAL NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queues (
+    guild_id INTEGER PRIMARY KEY,
+    tracks TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queue_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    op TEXT NOT NULL
+);
+"""
+
+def encode_track(track):
+    """Just enough of a track reference to queue it again; streams are re-resolved"""
+    return [track.id, track.title, track.webpage_url, track.duration, track.requester_id]
+
+def decode_track(row):
+    video_id, title, webpage_url, duration, requester_id = row
+    return Track(video_id, title, webpage_url, duration=duration, requester_id=requester_id)
+
+def encode_op(op, args):
+    if op == "put" or op == "insert":
+        args = (*args[:-1], encode_track(args[-1]))
+    elif op in ("put_many", "replace"):
+        args = ([encode_track(track) for track in args[0]],)
+    return json.dumps([op, *args], separators=(",", ":"))
+
+def apply_op(items, op, args):
+    """Replay one logged TrackQueue change on a list of encoded tracks"""
+    if op == "put":
+        items.append(args[0])
+    elif op == "put_many":
+        items.extend(args[0])
+    elif op == "get":
+        if items:
+            del items[0]
+    elif op == "insert":
+        items.insert(args[0], args[1])
+    elif op == "remove":
+        del items[args[0]]
+    elif op == "move":
+        items.insert(args[1], items.pop(args[0]))
+    elif op == "replace":
+        items[:] = args[0]
+    elif op == "clear":
+        items.clear()
+
+class GuildState:
+    """What was stored for one guild"""
+
+    def __init__(self, guild_id, voice_channel_id=None, text_channel_id=None,
+                 always_on=False, now_playing=None, position=0, queue=()):
+        self.guild_id = guild_id
+        self.voice_channel_id = voice_channel_id
+        self.text_channel_id = text_channel_id
+        self.always_on = always_on
+        self.now_playing = now_playing
+        self.position = position
+        self.queue = list(queue)
+
+class StateStore:
+    """Guild channels and queues in SQLite, for restoring after a restart.
+
+    Queue changes are appended to queue_log as TrackQueue reports them
+    (batched every STATE_FLUSH_INTERVAL); snapshot() rewrites the queues
+    and truncates the log, so a restore reads one row per guild plus the
+    changes since the last snapshot. All database work runs on one worker
+    thread, in WAL mode so writes don't wait on readers.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.ops = []  # (guild_id, encoded op) waiting for the next flush
+        self.guilds = {}  # guild_id -> column updates waiting for the next flush
+        self.forgotten = set()
+        self.writes = 0
+        self.snapshots = 0
+        self.last_flush_ms = 0.0
+        self.last_snapshot_ms = 0.0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-store")
+        self.db = None
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def open(self):
+        await self._run(self._open)
+        return self
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Shard processes sharing the file wait for each other's write transactions
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints, enough for a queue
+        self.db.executescript(SCHEMA)
+
+    def queue_listener(self, guild_id):
+        """TrackQueue listener that logs a guild's queue changes"""
+        def listener(op, *args):
+            self.ops.append((guild_id, encode_op(op, args)))
+        return listener
+
+    def update_guild(self, guild_id, **columns):
+        """Queue an update of a guild's row, e.g. voice_channel_id or always_on"""
+        self.guilds.setdefault(guild_id, {}).update(columns)
+
+    def forget(self, guild_id):
+        """Delete everything stored for a guild; updates made after this are kept"""
+        self.guilds.pop(guild_id, None)
+        self.ops = [entry for entry in self.ops if entry[0] != guild_id]
+        self.forgotten.add(guild_id)
+
+    async def flush(self):
+        if not (self.ops or self.guilds or self.forgotten):
+            return
+        ops, guilds, forgotten = self.ops, self.guilds, self.forgotten
+        self.ops, self.guilds, self.forgotten = [], {}, set()
+        await self._run(self._flush, ops, guilds, forgotten)
+
+    def _flush(self, ops, guilds, forgotten):
+        started = time.perf_counter()
+        with self.db:
+            for guild_id in forgotten:
+                for table in ("guilds", "queues", "queue_log"):
+                    self.db.execute(f"DELETE FROM {table} WHERE guild_id = ?", (guild_id,))
+            for guild_id, columns in guilds.items():
+                self._upsert_guild(guild_id, columns)
+            self.db.executemany("INSERT INTO queue_log (guild_id, op) VALUES (?, ?)", ops)
+        self.writes += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def _upsert_guild(self, guild_id, columns):
+        columns = {**columns, "updated_at": time.time()}
+        if "now_playing" in columns and columns["now_playing"] is not None:
+            columns["now_playing"] = json.dumps(encode_track(columns["now_playing"]))
+        names = ", ".join(columns)
+        marks = ", ".join("?" for _ in columns)
+        updates = ", ".join(f"{name} = excluded.{name}" for name in columns)
+        self.db.execute(
+            f"INSERT INTO guilds (guild_id, {names}) VALUES (?, {marks}) "
+            f"ON CONFLICT(guild_id) DO UPDATE SET {updates}",
+            (guild_id, *columns.values()),
+        )
+
+    async def snapshot(self, queues, guilds):
+        """Rewrite the given guilds' queues and drop their change log.
+
+        queues maps guild_id to its current tracks; guilds maps guild_id to
+        column updates (now playing, position) like update_guild(). Other
+        guilds' rows are only deleted if they were forgotten, so a guild
+        that was not restored keeps its queue and shard processes can share
+        a file.
+        """
+        # Pending ops of the snapshotted queues are superseded, but pending guild updates are not
+        for guild_id, columns in guilds.items():
+            self.update_guild(guild_id, **columns)
+        updates, forgotten = self.guilds, self.forgotten
+        self.ops = [entry for entry in self.ops if entry[0] not in queues]
+        self.guilds, self.forgotten = {}, set()
+        encoded = {gid: json.dumps([encode_track(t) for t in tracks], separators=(",", ":"))
+                   for gid, tracks in queues.items()}
+        await self._run(self._snapshot, encoded, updates, forgotten)
+
+    def _snapshot(self, queues, guilds, forgotten):
+        started = time.perf_counter()
+        with self.db:
+            for guild_id in forgotten:
+                for table in ("guilds", "queues", "queue_log"):
+                    self.db.execute(f"DELETE FROM {table} WHERE guild_id = ?", (guild_id,))
+            for guild_id, columns in guilds.items():
+                self._upsert_guild(guild_id, columns)
+            self.db.executemany("DELETE FROM queue_log WHERE guild_id = ?", [(gid,) for gid in queues])
+            self.db.executemany("INSERT OR REPLACE INTO queues (guild_id, tracks) VALUES (?, ?)", queues.items())
+        self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.snapshots += 1
+        self.last_snapshot_ms = (time.perf_counter() - started) * 1000
+
+    async def load(self):
+        """Every stored guild as {guild_id: GuildState}, queues replayed up to the last flush"""
+        return await self._run(self._load)
+
+    def _load(self):
+        states = {}
+        rows = self.db.execute(
+            "SELECT guild_id, voice_channel_id, text_channel_id, always_on, now_playing, position FROM guilds"
+        )
+        for guild_id, voice, text, always_on, now_playing, position in rows:
+            states[guild_id] = GuildState(
+                guild_id, voice, text, bool(always_on),
+                decode_track(json.loads(now_playing)) if now_playing else None,
+                position,
+            )
+        queues = {gid: json.loads(tracks) for gid, tracks in self.db.execute("SELECT guild_id, tracks FROM queues")}
+        for guild_id, op in self.db.execute("SELECT guild_id, op FROM queue_log ORDER BY seq"):
+            op, *args = json.loads(op)
+            try:
+                apply_op(queues.setdefault(guild_id, []), op, args)
+            except IndexError:
+                pass  # A change against a queue the snapshot no longer matches
+        for guild_id, tracks in queues.items():
+            state = states.setdefault(guild_id, GuildState(guild_id))
+            state.queue = [decode_track(row) for row in tracks]
+        return states
+
+    def stats(self):
+        return {
+            "pending_ops": len(self.ops),
+            "writes": self.writes,
+            "snapshots": self.snapshots,
+            "last_flush_ms": self.last_flush_ms,
+            "last_snapshot_ms": self.last_snapshot_ms,
+        }
+
+    async def close(self):
+        await self.flush()
+        await self._run(self.db.close)
+        self.executor.shutdown(wait=False)
+
+def create_state_store():
+    """StateStore from the environment, or None when disabled"""
+    if not STATE_DB:
+        return None
+    return StateStore(STATE_DB)
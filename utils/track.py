@@ -0,0 +1,67 @@
+import re
+import sys
+from dataclasses import dataclass, replace
+
+EXPIRE_RE = re.compile(r"[?&/]expire[=/](\d+)")
+
+def stream_expiry(url):
+    """Unix time a signed googlevideo URL stops working, or None if unknown"""
+    match = EXPIRE_RE.search(url or "")
+    return int(match.group(1)) if match else None
+
+def _intern(value):
+    return sys.intern(value) if value else value
+
+@dataclass(frozen=True, slots=True)
+class Track:
+    """One queued or playing track.
+
+    A reference (url is None) is what the queue holds; with_stream() gives
+    the resolved copy used for playback. Instances are immutable, so the
+    cache can hand the same object to every guild that queues it.
+    """
+
+    id: str
+    title: str
+    webpage_url: str
+    duration: int | None = None
+    url: str | None = None  # Direct stream URL or local file, once resolved
+    acodec: str | None = None
+    asr: int | None = None
+    expires_at: int | None = None  # When url stops working (unix time)
+    requester_id: int | None = None
+
+    def __post_init__(self):
+        # Ids and codec names repeat across extractions, share one copy of each
+        object.__setattr__(self, "id", _intern(self.id))
+        object.__setattr__(self, "acodec", _intern(self.acodec))
+
+    @classmethod
+    def from_info(cls, info, query=None):
+        """Resolved Track from a processed yt-dlp info dict"""
+        return cls(
+            id=info.get("id"),
+            title=info.get("title") or "Unknown Title",
+            webpage_url=info.get("webpage_url") or query,
+            duration=info.get("duration"),
+            url=info["url"],
+            acodec=info.get("acodec"),
+            asr=info.get("asr"),
+            expires_at=stream_expiry(info["url"]),
+        )
+
+    @property
+    def resolved(self):
+        return self.url is not None
+
+    def reference(self):
+        """This track without its stream details"""
+        if not self.resolved:
+            return self
+        return replace(self, url=None, acodec=None, asr=None, expires_at=None)
+
+    def with_stream(self, url, acodec=None, asr=None, expires_at=None):
+        return replace(self, url=url, acodec=acodec, asr=asr, expires_at=expires_at)
+
+    def with_requester(self, requester_id):
+        return replace(self, requester_id=requester_id)
@@ -0,0 +1,137 @@
+import asyncio
+import itertools
+import os
+import random
+from collections import deque
+
+QUEUE_MAX_LENGTH = int(os.getenv("QUEUE_MAX_LENGTH", 5000))
+
+class QueueFull(Exception):
+    """Raised when adding to a queue that is already at its max length"""
+
+class TrackQueue:
+    """Per-guild track queue.
+
+    Backed by a deque, so appends and pops from either end are O(1) and
+    rendering the first k entries is O(k) instead of copying the whole
+    queue. player_loop waits on get() the same way it did on asyncio.Queue.
+
+    If listener is set, it is called as listener(op, *args) after every
+    change, so the state store can log mutations instead of rewriting the
+    whole queue.
+    """
+
+    def __init__(self, maxlen=QUEUE_MAX_LENGTH, listener=None):
+        self.maxlen = maxlen
+        self.listener = listener
+        self._items = deque()
+        self._getters = deque()  # Futures of get() calls waiting for an item
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def empty(self):
+        return not self._items
+
+    def qsize(self):
+        return len(self._items)
+
+    def _changed(self, op, *args):
+        if self.listener:
+            self.listener(op, *args)
+
+    def _wake(self):
+        while self._getters and self._items:
+            getter = self._getters.popleft()
+            if not getter.done():
+                getter.set_result(None)
+                break
+
+    def put(self, item):
+        if len(self._items) >= self.maxlen:
+            raise QueueFull(f"The queue is full ({self.maxlen} tracks).")
+        self._items.append(item)
+        self._changed("put", item)
+        self._wake()
+
+    def put_many(self, items):
+        """Append as many items as fit, returning how many were added"""
+        room = self.maxlen - len(self._items)
+        added = list(itertools.islice(items, max(room, 0)))
+        self._items.extend(added)
+        if added:
+            self._changed("put_many", added)
+            self._wake()
+        return len(added)
+
+    async def get(self):
+        while not self._items:
+            getter = asyncio.get_running_loop().create_future()
+            self._getters.append(getter)
+            try:
+                await getter
+            except asyncio.CancelledError:
+                getter.cancel()
+                if not getter.cancelled():
+                    self._wake()  # Woken but cancelled before taking the item, pass it on
+                raise
+        item = self._items.popleft()
+        self._changed("get")
+        return item
+
+    def peek(self, count):
+        """The next count items, without removing them"""
+        return list(itertools.islice(self._items, count))
+
+    def slice(self, start, stop):
+        return list(itertools.islice(self._items, start, stop))
+
+    def insert(self, index, item):
+        if len(self._items) >= self.maxlen:
+            raise QueueFull(f"The queue is full ({self.maxlen} tracks).")
+        self._items.insert(index, item)
+        self._changed("insert", index, item)
+        self._wake()
+
+    def remove(self, index):
+        """Remove and return the item at a 0-based index"""
+        item = self._items[index]
+        del self._items[index]
+        self._changed("remove", index)
+        return item
+
+    def move(self, source, destination):
+        """Move the item at source to destination (0-based), returning it"""
+        item = self._items[source]
+        del self._items[source]
+        self._items.insert(destination, item)
+        self._changed("move", source, destination)
+        return item
+
+    def shuffle(self):
+        items = list(self._items)
+        random.shuffle(items)
+        self._items = deque(items)
+        self._changed("replace", items)
+
+    def dedupe(self, key=lambda track: track.id):
+        """Drop later duplicates, keeping queue order; returns how many were removed"""
+        seen = set()
+        kept = deque()
+        for item in self._items:
+            item_key = key(item)
+            if item_key not in seen:
+                seen.add(item_key)
+                kept.append(item)
+        removed = len(self._items) - len(kept)
+        self._items = kept
+        if removed:
+            self._changed("replace", list(kept))
+        return removed
+
+    def clear(self):
+        self._items.clear()
+        self._changed("clear")